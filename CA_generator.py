@@ -1,17 +1,20 @@
-from numpy.random import choice
+import functools
+import numpy as np
 
 
-def permuter(N):
+@functools.lru_cache(maxsize=None)
+def compositions(N):
     '''
-    Generate all divisions of 8 into an N-tuple.
+    Returns all divisions of 8 into N parts as a read only integer array of shape (count, N).
 
-    This yields all N-tuples made up of positive integers such that the sum is 8.
+    The rows are in the same order as they are yielded by permuter, the first row is (8, 0, ..., 0). The array is
+    only built once for each N.
     '''
     head_dict = {x: 8 for x in range(N)}
     head_dict[-1] = 0
+    rows = []
     while True:
-        pertmutation = tuple(head_dict[x]-head_dict[x-1] for x in range(N))
-        yield pertmutation
+        rows.append([head_dict[x]-head_dict[x-1] for x in range(N)])
         done = True
         for x in range(N-1):
             if head_dict[x] > 0:
@@ -22,6 +25,89 @@ def permuter(N):
                 break
         if done:
             break
+    array = np.array(rows, dtype=np.int64)
+    array.setflags(write=False)
+    return array
+
+
+def permuter(N):
+    '''
+    Generate all divisions of 8 into an N-tuple.
+
+    This yields all N-tuples made up of positive integers such that the sum is 8.
+    '''
+    for pertmutation in compositions(N).tolist():
+        yield tuple(pertmutation)
+
+
+def next_state_weights(n_states, sparsity=0.6, conservatism=0.25):
+    '''
+    Returns the probability of each next state for each current state, as an array of shape (n_states, n_states).
+
+    See CA_rules.random_dict for the meaning of sparsity and conservatism.
+    '''
+    if sparsity < 0:
+        raise Exception('sparsity should be greater than 0')
+    if conservatism < 0:
+        raise Exception('conservatism should be greater than 0')
+    if sparsity + conservatism > 1:
+        raise Exception('sparsity and conservatism should not add to more than 1')
+    if n_states < 3:
+        raise Exception('random rules need at least 3 states')
+    other = (1-sparsity-conservatism)/(n_states - 2)
+    weights = np.full((n_states, n_states), other)
+    weights[:, 0] = sparsity
+    weights[np.arange(n_states), np.arange(n_states)] = conservatism
+    weights[0, 0] = 1 - (1-sparsity-conservatism) * (n_states - 1) / (n_states - 2)
+    return weights
+
+
+def random_tables(n_states, count=None, sparsity=0.6, conservatism=0.25, seed=None):
+    '''
+    Generates the rules of random CAs as tables of next states.
+
+    Entry [state, k] of a table is the next state of a cell in that state whose neighbourhood is row k of
+    compositions(n_states). The next states for each current state are drawn for every table at once.
+
+    Args:
+
+    * n_states(int):
+        describes the number of states of the CA
+
+    Kwargs:
+
+    * count(int or None):
+        the number of tables to generate. If None, a single table is returned rather than a stack of them.
+    * sparsity(float), conservatism(float):
+        as for CA_rules.random_dict
+    * seed(int, numpy Generator or None):
+        seeds the random choices. If None, numpy's global random state is used, so numpy.random.seed still makes
+        the tables reproducible.
+
+    Returns:
+        numpy array of shape (count, n_states, len(compositions(n_states))), or without the first axis if count is
+        None.
+    '''
+    weights = next_state_weights(n_states, sparsity, conservatism)
+    rng = np.random if seed is None else np.random.default_rng(seed)
+    neighbourhoods = compositions(n_states)
+    shape = (1 if count is None else count, len(neighbourhoods))
+    tables = np.empty((shape[0], n_states, shape[1]), dtype=np.uint8)
+    for state in range(n_states):
+        tables[:, state] = rng.choice(n_states, size=shape, p=weights[state])
+    # the described CA will be 'semistable', dead cells far from live cells will remain dead.
+    tables[:, :, neighbourhoods[:, 0] == 8] = 0
+    if count is None:
+        return tables[0]
+    return tables
+
+
+def table_to_dict(table):
+    '''Converts a table made by random_tables into a dictionary of the form used by CA_rules.'''
+    n_states = table.shape[0]
+    keys = list(permuter(n_states))
+    return {(state, permutation): next_state
+            for state, row in enumerate(table.tolist()) for permutation, next_state in zip(keys, row)}
 
 
 def tup_to_dict(tup):
@@ -38,14 +124,14 @@ def dict_to_tup(dictionary):
 
 class CA_rules:
     '''Generates and stores CA rules in function and dictionary form.'''
-    def __init__(self, CA_dict=None, N_states=3):
+    def __init__(self, CA_dict=None, N_states=3, seed=None):
         if CA_dict is None:
-            self.CA_dict = self.random_dict(N_states)
+            self.CA_dict = self.random_dict(N_states, seed=seed)
         else:
             self.CA_dict = CA_dict
         self.rules = self.make_rules(self.CA_dict)
 
-    def random_dict(self, n_states, sparsity=0.6, conservatism=0.25):
+    def random_dict(self, n_states, sparsity=0.6, conservatism=0.25, seed=None):
         '''
         Generates a random dictionary describing the rules of a CA.
 
@@ -67,36 +153,12 @@ class CA_rules:
 
         * conservatism(float):
             a number between 0 and 1 which describes how often cells retain their previous state.
+
+        * seed(int or None):
+            seeds the random choices, see random_tables.
         '''
-        if sparsity < 0:
-            raise Exception('sparsity should be greater than 0')
-        if conservatism < 0:
-            raise Exception('conservatism should be greater than 0')
-        if sparsity + conservatism > 1:
-            raise Exception('sparsity and conservatism should not add to more than 1')
-        rule_dict = dict()
-        for state in range(n_states):
-            for permutation in permuter(n_states):
-                key = (state, permutation)
-                # the described CA will be 'semistable', dead cells far from live cells will remain dead.
-                if permutation[0] == 8:
-                    next_state = 0
-                else:
-                    # the distribution of next states is controlled to influence the behaviour of the CA.
-                    def weight_rule(x):
-                        if x == 0 and state == 0:
-                            weight = 1 - (1-sparsity-conservatism) * (n_states - 1) / (n_states - 2)
-                        elif x == 0:
-                            weight = sparsity
-                        elif x == state:
-                            weight = conservatism
-                        else:
-                            weight = (1-sparsity-conservatism)/(n_states - 2)
-                        return weight
-                    weights = [weight_rule(x) for x in range(n_states)]
-                    next_state = int(choice(list(range(n_states)), p=weights))
-                rule_dict[key] = next_state
-        return rule_dict
+        table = random_tables(n_states, sparsity=sparsity, conservatism=conservatism, seed=seed)
+        return table_to_dict(table)
 
     def make_rules(self, CA_dict):
         '''
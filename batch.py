@@ -0,0 +1,247 @@
+import numpy as np
+import engines
+import wireworld
+
+
+def same_rule(first, second):
+    '''Returns True if two CAs are the same object, or have the same mode and compiled rule table.'''
+    if first is second:
+        return True
+    if first.ruletable is None or second.ruletable is None:
+        return False
+    return first.mode == second.mode and np.array_equal(first.ruletable, second.ruletable)
+
+
+class WorldBatch:
+    '''
+    Runs many worlds which share a CA as a single array.
+
+    Every world is laid out in the same way, so a cell has the same array position in every world and all of them
+    are stepped together with the compiled rule. Each world may be stopped on its own, either because a predicate
+    became true for it or because it stopped changing, after which it is no longer stepped.
+
+    For a semistable CA the B worlds share a bounding box, giving a (B, H, W) array. In a stable CA, such as
+    wireworld, dead cells never come alive, so only the N cells which are live in some world are kept, along with
+    the positions of the neighbours of each of them. For a circuit this is far smaller than its bounding box. The
+    array is then (N, B), so that gathering the neighbours of every cell reads whole rows.
+    '''
+    margin = 8  # the number of empty cells added to each side when the array grows
+
+    def __init__(self, contents, CA=None, CA_type=None):
+        '''
+        Args:
+
+        * contents (list):
+            The initial states of the worlds, each either a dict mapping coordinates to states or a World.
+
+        Kwargs:
+
+        * CA (CA object):
+            The cellular automata shared by the worlds. If None, it is found from CA_type.
+        * CA_type (string):
+            A label corresponding to the type of cellular automata to be run. If neither CA nor CA_type is given,
+            both are taken from the Worlds among the contents, or default to wireworld if there are none.
+        '''
+        worlds = [content for content in contents if isinstance(content, wireworld.World)]
+        for world in worlds[1:]:
+            if not same_rule(world.CA, worlds[0].CA):
+                raise Exception('The worlds of a batch must share a CA')
+        grids = [content.grid if isinstance(content, wireworld.World) else content for content in contents]
+        if CA is None and CA_type is None and worlds:
+            CA = worlds[0].CA
+            CA_type = worlds[0].CA_type
+        if CA_type is None:
+            CA_type = 'wireworld'
+        if CA is None:
+            CA = wireworld.CA_dict[CA_type]
+        if CA.mode != 'stable' and CA.mode != 'semistable':
+            raise Exception('A batch requires a stable or semistable CA')
+        self.CA = CA
+        self.CA_type = CA_type
+        if CA.mode == 'stable':
+            self.load_cells(grids)
+        else:
+            self.load_array(grids)
+        self.active = np.ones(len(grids), dtype=bool)
+        self.generation = np.zeros(len(grids), dtype=np.int64)
+        self.finished = np.full(len(grids), -1, dtype=np.int64)  # the generation at which each world was stopped
+
+    def load_cells(self, grids):
+        '''Builds the (N, B) array of the cells which are live in any world, and the neighbours of each cell.'''
+        self.coords = list({coord: None for grid in grids for coord, state in grid.items() if state != 0})
+        self.ids = {coord: i for i, coord in enumerate(self.coords)}
+        n_cells = len(self.coords)
+        # neighbours which are not live in any world point to an extra row which is always 0
+        self.neighbours = np.full((n_cells, 8), n_cells, dtype=np.int64)
+        for i, (x, y) in enumerate(self.coords):
+            for k, (dx, dy) in enumerate(engines.neighbour_offsets):
+                self.neighbours[i, k] = self.ids.get((x + dx, y + dy), n_cells)
+        self.array = np.zeros((n_cells, len(grids)), dtype=np.uint8)
+        for index, grid in enumerate(grids):
+            for coord, state in grid.items():
+                if state != 0:
+                    self.array[self.ids[coord], index] = state
+
+    def load_array(self, grids):
+        '''Builds the (B, H, W) array covering the bounding box of every world.'''
+        self.coords = None
+        coords = [coord for grid in grids for coord in grid]
+        if coords:
+            xs, ys = zip(*coords)
+        else:
+            xs, ys = (0,), (0,)
+        self.origin = (min(xs) - self.margin, min(ys) - self.margin)
+        shape = (len(grids), max(ys) - min(ys) + 1 + 2*self.margin, max(xs) - min(xs) + 1 + 2*self.margin)
+        self.array = np.zeros(shape, dtype=np.uint8)
+        for index, grid in enumerate(grids):
+            for (x, y), state in grid.items():
+                self.array[index, y - self.origin[1], x - self.origin[0]] = state
+
+    def __len__(self):
+        return len(self.active)
+
+    def position(self, coord):
+        '''Returns the array position of a world coordinate, or None if it lies outside the array.'''
+        if self.coords is not None:
+            cell = self.ids.get(coord)
+            return None if cell is None else (cell,)
+        x = coord[0] - self.origin[0]
+        y = coord[1] - self.origin[1]
+        if 0 <= y < self.array.shape[1] and 0 <= x < self.array.shape[2]:
+            return y, x
+        return None
+
+    def getcoordstate(self, coord):
+        '''Returns the state of a coordinate in every world.'''
+        position = self.position(coord)
+        if position is None:
+            return np.zeros(len(self), dtype=np.uint8)
+        if self.coords is not None:
+            return self.array[position]
+        return self.array[(slice(None),) + position]
+
+    def grid(self, index):
+        '''Returns the live cells of one of the worlds as a grid.'''
+        if self.coords is not None:
+            cells = np.flatnonzero(self.array[:, index])
+            states = self.array[cells, index].tolist()
+            return {self.coords[cell]: state for cell, state in zip(cells.tolist(), states)}
+        ys, xs = np.nonzero(self.array[index])
+        states = self.array[index, ys, xs].tolist()
+        xs = (xs + self.origin[0]).tolist()
+        ys = (ys + self.origin[1]).tolist()
+        return dict(zip(zip(xs, ys), states))
+
+    def world(self, index):
+        '''Returns one of the worlds as a World, or a WireWorld if the CA is wireworld.'''
+        if self.CA_type == 'wireworld':
+            return wireworld.WireWorld(content=self.grid(index))
+        return wireworld.World(content=self.grid(index), CA=self.CA, CA_type=self.CA_type)
+
+    def grow(self):
+        '''Pads the array on any side where a live cell in any world has reached the edge.'''
+        array = self.array
+        pad_n = self.margin if array[:, 0].any() else 0
+        pad_s = self.margin if array[:, -1].any() else 0
+        pad_w = self.margin if array[:, :, 0].any() else 0
+        pad_e = self.margin if array[:, :, -1].any() else 0
+        if pad_n or pad_s or pad_w or pad_e:
+            self.array = np.pad(array, ((0, 0), (pad_n, pad_s), (pad_w, pad_e)))
+            self.origin = (self.origin[0] - pad_w, self.origin[1] - pad_n)
+
+    def next_cells(self, cells):
+        '''
+        Returns the next generation of an (N, B) array of cells of a stable CA.
+
+        Rather than counting the neighbours in each state separately, the weight of the state of each neighbour is
+        added up, giving the neighbourhood part of the index of each cell in the rule table in a single pass.
+        '''
+        n_states = len(self.CA.states)
+        stride = 9**(n_states-1)
+        weights = np.array([0] + [9**(n_states-1-state) for state in range(1, n_states)], dtype=np.int64)
+        if self.CA.ruletable is not None:
+            weights = weights.astype(np.int32)
+        weighted = weights[np.pad(cells, ((0, 1), (0, 0)))]
+        nbhd_index = np.zeros(cells.shape, dtype=weights.dtype)
+        for k in range(8):
+            nbhd_index += weighted[self.neighbours[:, k]]
+        if self.CA.ruletable is not None:
+            new_cells = self.CA.ruletable[cells * weights.dtype.type(stride) + nbhd_index]
+        else:
+            counts = np.empty((n_states,) + cells.shape, dtype=np.uint8)
+            for state in reversed(range(1, n_states)):
+                nbhd_index, counts[state] = np.divmod(nbhd_index, 9)
+            counts[0] = 8 - counts[1:].sum(axis=0, dtype=np.uint8)
+            new_cells = engines.apply_rule(self.CA, cells, counts)
+        new_cells[cells == 0] = 0
+        return new_cells
+
+    def stop(self, stopping):
+        '''Stops the worlds marked in a boolean array, recording the generation each of them reached.'''
+        stopping = stopping & self.active
+        self.finished[stopping] = self.generation[stopping]
+        self.active &= ~stopping
+
+    def step(self):
+        '''
+        Runs one step of the cellular automata in every active world.
+
+        Returns:
+            numpy array of bool, which of the worlds changed.
+        '''
+        changed = np.zeros(len(self), dtype=bool)
+        if not self.active.any():
+            return changed
+        if self.coords is not None:
+            old_cells = self.array[:, self.active]
+            new_cells = self.next_cells(old_cells)
+            self.array[:, self.active] = new_cells
+            changed[self.active] = (new_cells != old_cells).any(axis=0)
+        else:
+            if self.CA.mode == 'semistable':
+                self.grow()
+            old_arrays = self.array[self.active]
+            new_arrays = engines.next_generation(self.CA, old_arrays)
+            if self.CA_type == 'random':
+                engines.apply_cutoff(new_arrays, self.origin)
+            self.array[self.active] = new_arrays
+            changed[self.active] = (new_arrays != old_arrays).any(axis=(1, 2))
+        self.generation[self.active] += 1
+        return changed
+
+    def run(self, steps, predicate=None, stop_when_static=False):
+        '''
+        Runs up to a number of steps, stopping each world once it is finished.
+
+        Args:
+
+        * steps (int):
+            The most generations to run.
+
+        Kwargs:
+
+        * predicate (function or None):
+            Called with the batch after each step, it should return a boolean array with one entry per world.
+            Worlds for which it is True are stopped.
+        * stop_when_static (bool):
+            If True, worlds which did not change in a step are stopped.
+
+        Returns:
+            numpy array, the generation at which each world was stopped, or -1 for worlds still running.
+        '''
+        for _ in range(steps):
+            if not self.active.any():
+                break
+            changed = self.step()
+            if predicate is not None:
+                self.stop(np.asarray(predicate(self), dtype=bool))
+            if stop_when_static:
+                self.stop(~changed)
+        return self.finished
+
+
+def cell_reaches(coord, state):
+    '''Returns a predicate for WorldBatch.run which is True for the worlds in which a cell is in the given state.'''
+    def predicate(batch):
+        return batch.getcoordstate(coord) == state
+    return predicate
@@ -0,0 +1,96 @@
+'''
+Compares the semistable step of World, which counts the neighbours of the live cells into one dict and looks up the
+compiled rule table for all of them at once, with the previous step, which padded the grid with zero cells and
+trimmed them again afterwards.
+
+Run from the top of the repository with:
+
+    python benchmarks/bench_semistable.py [size] [steps]
+'''
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import wireworld
+
+
+def pad(world):
+    '''Adds all cells adjacent to existing cells, as World.pad did.'''
+    for coord in world.grid.copy():
+        for x, y in wireworld.relative_nbhd:
+            neighbour = (coord[0] + x, coord[1] + y)
+            world.grid.setdefault(neighbour, 0)
+
+
+def trim(world):
+    '''
+    Removes all cells containing zeroes, as World.trim did.
+
+    Live cells removed beyond the cutoff of a random CA are added to the changeset, keeping any earlier state it
+    already holds for them.
+    '''
+    for coord, state in world.grid.copy().items():
+        if state == 0 or (world.CA_type == 'random' and (max(coord) > 120 or min(coord) < -120)):
+            del world.grid[coord]
+            if state != 0:
+                world.changeset.setdefault(coord, state)
+
+
+def legacy_step(world):
+    '''Steps a world as World.step did originally, padding and trimming the whole grid.'''
+    new_states = dict()
+    pad(world)
+    world.changeset = dict()
+    for coord, state in world.grid.items():
+        nbhd_state = world.getneighbours(coord)
+        new_state = world.CA.rule(state, nbhd_state)
+        new_states[coord] = new_state
+        if state != new_state:
+            world.changeset[coord] = state
+    world.grid = new_states
+    trim(world)
+    world.record_changes(generations=1)
+
+
+def soup(size, density=0.35, seed=1):
+    '''Returns a square of randomly placed live cells.'''
+    rng = random.Random(seed)
+    return {(x, y): 1 for x in range(size) for y in range(size) if rng.random() < density}
+
+
+def measure(make_world, step, steps):
+    '''
+    Returns the seconds per step, and the peak memory allocated while stepping in bytes.
+
+    Memory is traced in a separate run, since tracing slows down every allocation.
+    '''
+    world = make_world()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step(world)
+    elapsed = time.perf_counter() - start
+    world = make_world()
+    tracemalloc.start()
+    for _ in range(steps):
+        step(world)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / steps, peak
+
+
+def main(size=150, steps=10):
+    random_CA = wireworld.CA(states=3, getrandom=True)
+    worlds = {'life': lambda: wireworld.World(content=soup(size), CA_type='life'),
+              'random': lambda: wireworld.World(content=soup(size), CA=random_CA, CA_type='random')}
+    for name, make_world in worlds.items():
+        legacy = measure(make_world, legacy_step, steps)
+        counted = measure(make_world, wireworld.World.step, steps)
+        for label, (seconds, peak) in (('pad/trim', legacy), ('counted', counted)):
+            print('{:<8} {:<9} {:8.4f} s/step {:8.1f} MiB peak'.format(name, label, seconds, peak / 2**20))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
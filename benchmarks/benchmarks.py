@@ -0,0 +1,121 @@
+'''
+Benchmarks for stepping, loading and saving worlds, written in the style of airspeed velocity (asv).
+
+Each class is a group of benchmarks run for every combination of its params. setup is called with the params
+before each benchmark, methods starting with time_ are timed and methods starting with track_ return a number,
+here the peak memory allocated while stepping. They can be run without asv with python -m benchmarks.run.
+'''
+import os
+import shutil
+import tempfile
+import tracemalloc
+from . import workloads
+import wireworld
+
+
+steps = 10  # the number of generations run by each timed call
+
+
+def run_steps(world, n=steps):
+    for _ in range(n):
+        world.step()
+
+
+def traced_peak(function, *args):
+    '''Returns the peak memory in bytes allocated while calling a function.'''
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class BundledWorlds:
+    '''Steps, loads and saves the bundled json worlds.'''
+    params = (list(workloads.bundled_worlds), [None, 'numpy', 'incremental'])
+    param_names = ('world', 'engine')
+
+    def setup(self, name, engine):
+        self.world = workloads.bundled(name, engine=engine)
+        self.directory = tempfile.mkdtemp()
+        self.outfile = os.path.join(self.directory, name)
+
+    def teardown(self, name, engine):
+        shutil.rmtree(self.directory)
+
+    def time_step(self, name, engine):
+        run_steps(self.world)
+
+    def time_load(self, name, engine):
+        workloads.bundled(name, engine=engine)
+
+    def time_save(self, name, engine):
+        wireworld.save_world(self.world, self.outfile, permission='w')
+
+    def track_step_memory(self, name, engine):
+        return traced_peak(run_steps, self.world)
+    track_step_memory.unit = 'bytes'
+
+
+class WireLoops:
+    '''Steps a single loop of wire carrying one electron, which should cost the same at any length.'''
+    params = ([100, 1000, 10000],)
+    param_names = ('length',)
+
+    def setup(self, length):
+        self.world = wireworld.WireWorld(content=workloads.wire_loop(length))
+
+    def time_step(self, length):
+        run_steps(self.world)
+
+    def time_build_graph(self, length):
+        self.world.invalidate()
+        self.world.step()
+
+
+class ClockGrids:
+    '''Steps square grids of clocks, where the work grows with the number of clocks.'''
+    params = ([4, 16, 32], [None, 'numpy', 'incremental'])
+    param_names = ('clocks', 'engine')
+
+    def setup(self, clocks, engine):
+        self.world = wireworld.WireWorld(content=workloads.clock_grid(clocks, clocks), engine=engine)
+
+    def time_step(self, clocks, engine):
+        run_steps(self.world)
+
+    def track_step_memory(self, clocks, engine):
+        return traced_peak(run_steps, self.world)
+    track_step_memory.unit = 'bytes'
+
+
+class LifeSoups:
+    '''Steps random soups for the game of life at a range of sizes and densities.'''
+    params = ([64, 128, 256], [0.1, 0.35], [None, 'numpy', 'bitboard', 'incremental'])
+    param_names = ('size', 'density', 'engine')
+
+    def setup(self, size, density, engine):
+        self.world = wireworld.World(content=workloads.life_soup(size, density), CA_type='life', engine=engine)
+
+    def time_step(self, size, density, engine):
+        run_steps(self.world)
+
+    def track_step_memory(self, size, density, engine):
+        return traced_peak(run_steps, self.world)
+    track_step_memory.unit = 'bytes'
+
+
+class RandomCAs:
+    '''Steps worlds with random rules, which vary widely in how busy they become.'''
+    params = ([0, 1, 2, 3], [None, 'numpy'])
+    param_names = ('seed', 'engine')
+
+    def setup(self, seed, engine):
+        self.world = workloads.random_ca_world(seed, engine=engine)
+
+    def time_step(self, seed, engine):
+        run_steps(self.world)
+
+    def time_generate_rule(self, seed, engine):
+        wireworld.CA(states=5, getrandom=True, seed=seed)
@@ -0,0 +1,61 @@
+'''
+Runs the benchmarks in benchmarks.py without asv, printing one line for each benchmark and set of params.
+
+Run from the top of the repository with:
+
+    python -m benchmarks.run [pattern] [--repeat R]
+
+where pattern selects the benchmarks whose names contain it, e.g. LifeSoups.time_step.
+'''
+import argparse
+import inspect
+import itertools
+import time
+from . import benchmarks
+
+
+def run_benchmark(cls, method_name, params, repeat):
+    '''Runs one benchmark for one set of params, returning its value and unit.'''
+    instance = cls()
+    instance.setup(*params)
+    try:
+        method = getattr(instance, method_name)
+        if method_name.startswith('track_'):
+            return method(*params), getattr(method, 'unit', '')
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            method(*params)
+            times.append(time.perf_counter() - start)
+        return min(times), 'seconds'
+    finally:
+        if hasattr(instance, 'teardown'):
+            instance.teardown(*params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmarks without asv.')
+    parser.add_argument('pattern', nargs='?', default='', help='only run benchmarks whose names contain this')
+    parser.add_argument('--repeat', type=int, default=3, help='the number of times each benchmark is timed')
+    args = parser.parse_args()
+    for class_name, cls in inspect.getmembers(benchmarks, inspect.isclass):
+        if not hasattr(cls, 'params'):
+            continue
+        for method_name in sorted(vars(cls)):
+            if not method_name.startswith(('time_', 'track_')):
+                continue
+            name = '{}.{}'.format(class_name, method_name)
+            if args.pattern not in name:
+                continue
+            for params in itertools.product(*cls.params):
+                label = ', '.join('{}={}'.format(*pair) for pair in zip(cls.param_names, params))
+                try:
+                    value, unit = run_benchmark(cls, method_name, params, args.repeat)
+                except Exception as error:
+                    print('{}({})  failed: {}'.format(name, label, error))
+                    continue
+                print('{}({})  {:.6g} {}'.format(name, label, value, unit))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+'''
+Worlds for benchmarking, either loaded from the bundled json files or generated at any size.
+'''
+import os
+import random
+import sys
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, root)
+import wireworld
+
+
+# the bundled worlds which are large enough to be worth timing
+bundled_worlds = ('count_9.json', 'binary_counter.json', 'stacked_04.json', 'cool_random_01.json')
+
+
+def bundled_path(name):
+    '''Returns the path of one of the bundled json worlds.'''
+    return os.path.join(root, name)
+
+
+def bundled(name, engine=None):
+    '''Loads one of the bundled json worlds.'''
+    return wireworld.load_world(bundled_path(name), engine=engine)
+
+
+def wire_loop(length):
+    '''
+    Returns the content of a square loop of wire carrying a single electron.
+
+    The corners of the square are left out, otherwise a cell either side of a corner would touch diagonally and
+    the electron would split.
+
+    Args:
+
+    * length (int):
+        The number of cells in the loop, rounded down to a multiple of 4 and at least 8.
+    '''
+    side = max(length // 4, 2) + 1
+    cells = [(x, 0) for x in range(1, side)] + [(side, y) for y in range(1, side)]
+    cells += [(side - x, side) for x in range(1, side)] + [(0, side - y) for y in range(1, side)]
+    content = {coord: 3 for coord in cells}
+    content[cells[0]] = 1
+    content[cells[-1]] = 2
+    return content
+
+
+def clock_grid(rows, columns, length=12, spacing=2):
+    '''
+    Returns the content of a grid of separate wire loops, each acting as a clock.
+
+    Args:
+
+    * rows, columns (int):
+        The number of clocks down and across.
+
+    Kwargs:
+
+    * length (int):
+        The number of cells in each loop.
+    * spacing (int):
+        The number of empty cells between neighbouring loops.
+    '''
+    loop = wire_loop(length)
+    pitch = max(x for x, y in loop) + 1 + spacing
+    content = dict()
+    for row in range(rows):
+        for column in range(columns):
+            for (x, y), state in loop.items():
+                content[(x + column * pitch, y + row * pitch)] = state
+    return content
+
+
+def life_soup(size, density=0.35, seed=0):
+    '''Returns the content of a square of randomly placed live cells for the game of life.'''
+    rng = random.Random(seed)
+    return {(x, y): 1 for x in range(size) for y in range(size) if rng.random() < density}
+
+
+def random_ca_world(seed, size=32, n_states=3, density=0.5, engine=None):
+    '''Returns a World with a random CA generated from a seed, started from a random square of cells.'''
+    rng = random.Random(seed)
+    content = {(x, y): rng.randrange(1, n_states)
+               for x in range(size) for y in range(size) if rng.random() < density}
+    ca = wireworld.CA(states=n_states, getrandom=True, seed=seed)
+    return wireworld.World(content=content, CA=ca, CA_type='random', engine=engine)
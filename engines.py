@@ -0,0 +1,560 @@
+import numpy as np
+
+
+# the relative positions of the neighbours of a cell
+neighbour_offsets = ((-1, -1), (0, -1), (1, -1),
+                     (-1, 0), (1, 0),
+                     (-1, 1), (0, 1), (1, 1))
+
+# the slices of a padded array which line up each neighbour with the cell it neighbours
+neighbour_slices = [(slice(1+y, y-1 if y < 1 else None), slice(1+x, x-1 if x < 1 else None))
+                    for x, y in neighbour_offsets]
+
+
+def count_neighbours(array, n_states):
+    '''
+    Counts the neighbours of every cell in each state.
+
+    Cells beyond the edge of the array are treated as being in state 0.
+
+    Args:
+
+    * array (numpy array):
+        The states of the cells. The last two axes are treated as y and x, any leading axes are treated as
+        independent worlds.
+    * n_states (int):
+        The number of states of the CA.
+
+    Returns:
+        numpy array of shape (n_states,) + array.shape, the count of neighbours in each state.
+    '''
+    pad_width = [(0, 0)] * (array.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(array, pad_width)
+    counts = np.zeros((n_states,) + array.shape, dtype=np.uint8)
+    for state in range(1, n_states):
+        is_state = (padded == state).view(np.uint8)
+        for y_slice, x_slice in neighbour_slices:
+            counts[state] += is_state[..., y_slice, x_slice]
+    counts[0] = 8 - counts[1:].sum(axis=0, dtype=np.uint8)
+    return counts
+
+
+def apply_rule(ca, array, counts):
+    '''
+    Returns the next states of an array of cells.
+
+    If the CA has a compiled rule table, the next states are gathered from it in one indexing operation. Otherwise
+    the rule of the CA is called once for each distinct combination of state and neighbourhood in the array, and
+    the results are spread across every cell with that combination.
+    '''
+    n_states = len(ca.states)
+    key = array.astype(np.int64)
+    for state in range(1, n_states):
+        key = key * 9 + counts[state]
+    if ca.ruletable is not None:
+        return ca.ruletable[key]
+    unique_keys, inverse = np.unique(key, return_inverse=True)
+    results = np.empty(len(unique_keys), dtype=np.uint8)
+    for index, unique_key in enumerate(unique_keys.tolist()):
+        nbhd_state = dict()
+        for state in reversed(range(1, n_states)):
+            unique_key, nbhd_state[state] = divmod(unique_key, 9)
+        nbhd_state[0] = 8 - sum(nbhd_state.values())
+        results[index] = ca.rule(unique_key, nbhd_state)
+    return results[inverse].reshape(array.shape)
+
+
+def next_generation(ca, array):
+    '''
+    Returns the next generation of an array of cells.
+
+    Dead cells are treated as they would be by World.step for the mode of the CA. In 'stable' mode they stay dead,
+    in 'semistable' mode they stay dead unless they have a live neighbour.
+    '''
+    counts = count_neighbours(array, len(ca.states))
+    new_array = apply_rule(ca, array, counts)
+    if ca.mode == 'stable':
+        new_array[array == 0] = 0
+    elif ca.mode == 'semistable':
+        new_array[(array == 0) & (counts[0] == 8)] = 0
+    return new_array
+
+
+def apply_cutoff(array, origin):
+    '''
+    Removes cells beyond the coordinate cutoff which World.trim applies to random CAs.
+
+    Args:
+
+    * array (numpy array):
+        The states of the cells, which are edited in place.
+    * origin (tuple):
+        The world coordinate of the top left cell of the array.
+    '''
+    x0, y0 = origin
+    height, width = array.shape[-2:]
+    array[..., :, :max(0, min(width, -120 - x0))] = 0
+    array[..., :, max(0, 121 - x0):] = 0
+    array[..., :max(0, min(height, -120 - y0)), :] = 0
+    array[..., max(0, 121 - y0):, :] = 0
+
+
+class DenseEngine:
+    '''
+    Steps a World by loading its bounding box into a NumPy array.
+
+    The array is kept between steps and grows when live cells reach its edge. Only the cells which change are
+    written back to the grid of the world, so the grid and changeset remain valid after every step.
+    '''
+    margin = 8  # the number of empty cells added to each side when the array grows
+
+    def __init__(self, world):
+        if world.CA.mode != 'stable' and world.CA.mode != 'semistable':
+            raise Exception('The numpy engine requires a stable or semistable CA')
+        self.array = None
+        self.origin = None  # the world coordinate of the top left cell of the array
+
+    def invalidate(self):
+        '''Forgets the array so that it is reloaded from the grid on the next step.'''
+        self.array = None
+
+    def load(self, world):
+        '''Loads the grid of the world into an array.'''
+        bounds = world.getbounds()
+        if bounds is None:
+            bounds = ((0, 0), (0, 0))
+        (x_min, x_max), (y_min, y_max) = bounds
+        self.origin = (x_min - self.margin, y_min - self.margin)
+        shape = (y_max - y_min + 1 + 2*self.margin, x_max - x_min + 1 + 2*self.margin)
+        self.array = np.zeros(shape, dtype=np.uint8)
+        live = [coord for coord, state in world.grid.items() if state != 0]
+        if live:
+            coords = np.array(live, dtype=np.int64)
+            states = np.array([world.grid[coord] for coord in live], dtype=np.uint8)
+            self.array[coords[:, 1] - self.origin[1], coords[:, 0] - self.origin[0]] = states
+
+    def grow(self):
+        '''Pads the array on any side where a live cell has reached the edge.'''
+        array = self.array
+        pad_n = self.margin if array[0].any() else 0
+        pad_s = self.margin if array[-1].any() else 0
+        pad_w = self.margin if array[:, 0].any() else 0
+        pad_e = self.margin if array[:, -1].any() else 0
+        if pad_n or pad_s or pad_w or pad_e:
+            self.array = np.pad(array, ((pad_n, pad_s), (pad_w, pad_e)))
+            self.origin = (self.origin[0] - pad_w, self.origin[1] - pad_n)
+
+    def step(self, world):
+        '''Runs one step of the cellular automata, updating the grid and changeset of the world.'''
+        if self.array is None:
+            self.load(world)
+        if world.CA.mode == 'semistable':
+            self.grow()
+        old_array = self.array
+        new_array = next_generation(world.CA, old_array)
+        if world.CA_type == 'random':
+            apply_cutoff(new_array, self.origin)
+        self.array = new_array
+
+        ys, xs = np.nonzero(new_array != old_array)
+        states = new_array[ys, xs].tolist()
+        old_states = old_array[ys, xs].tolist()
+        xs = (xs + self.origin[0]).tolist()
+        ys = (ys + self.origin[1]).tolist()
+        world.changeset = dict()
+        for coord, state, old_state in zip(zip(xs, ys), states, old_states):
+            if state == 0:
+                del world.grid[coord]
+            else:
+                world.grid[coord] = state
+            world.changeset[coord] = old_state
+
+
+def full_adder(a, b, c):
+    '''Adds three bitboards, returning the sum and carry bitboards.'''
+    a_xor_b = a ^ b
+    return a_xor_b ^ c, (a & b) | (c & a_xor_b)
+
+
+class BitboardEngine:
+    '''
+    Steps a World whose CA has two states by packing 64 cells into each word of a NumPy array.
+
+    Bit b of word w in row y holds the cell at (origin[0] + 64*w + b, origin[1] + y). Neighbours are counted for
+    whole rows at a time with bitwise full adders, giving the count as four bitboards, and the rule is applied by
+    combining the bitboards for each count which gives a live cell.
+    '''
+    margin = 64  # the number of empty rows, and the number of empty columns, added when the array grows
+
+    def __init__(self, world):
+        self.check_CA(world.CA)
+        self.bits = None
+        self.origin = None  # the world coordinate of the first bit of the first word
+
+    def invalidate(self):
+        '''Forgets the bitboard so that it is reloaded from the grid on the next step.'''
+        self.bits = None
+
+    def check_CA(self, ca):
+        '''Raises an exception if the engine cannot run a CA, this is checked again whenever the grid is reloaded.'''
+        if ca.mode != 'stable' and ca.mode != 'semistable':
+            raise Exception('The bitboard engine requires a stable or semistable CA')
+        if ca.states is None or len(ca.states) != 2:
+            raise Exception('The bitboard engine requires a CA with two states, this one has {}'.format(
+                'any number' if ca.states is None else len(ca.states)))
+
+    def load(self, world):
+        '''Packs the grid of the world into a bitboard, once its CA has been checked.'''
+        self.check_CA(world.CA)
+        bounds = world.getbounds()
+        if bounds is None:
+            bounds = ((0, 0), (0, 0))
+        (x_min, x_max), (y_min, y_max) = bounds
+        self.origin = (x_min - self.margin, y_min - self.margin)
+        n_words = (x_max - x_min) // 64 + 3
+        cells = np.zeros((y_max - y_min + 1 + 2*self.margin, 64*n_words), dtype=bool)
+        live = [coord for coord, state in world.grid.items() if state != 0]
+        if live:
+            coords = np.array(live, dtype=np.int64)
+            cells[coords[:, 1] - self.origin[1], coords[:, 0] - self.origin[0]] = True
+        self.bits = self.pack(cells)
+
+    def pack(self, cells):
+        '''Packs a boolean array whose width is a multiple of 64 into a bitboard.'''
+        return np.packbits(cells, axis=1, bitorder='little').view('<u8')
+
+    def unpack(self, bits):
+        '''Unpacks a bitboard into a boolean array.'''
+        return np.unpackbits(bits.view(np.uint8), axis=1, bitorder='little').view(bool)
+
+    def cells(self):
+        '''Returns the live cells of the bitboard as a grid.'''
+        ys, xs = np.nonzero(self.unpack(self.bits))
+        xs = (xs + self.origin[0]).tolist()
+        ys = (ys + self.origin[1]).tolist()
+        return {coord: 1 for coord in zip(xs, ys)}
+
+    def grow(self):
+        '''Pads the bitboard on any side where a live cell has reached the edge.'''
+        bits = self.bits
+        pad_n = self.margin if bits[0].any() else 0
+        pad_s = self.margin if bits[-1].any() else 0
+        pad_w = 1 if (bits[:, 0] & np.uint64(1)).any() else 0
+        pad_e = 1 if (bits[:, -1] >> np.uint64(63)).any() else 0
+        if pad_n or pad_s or pad_w or pad_e:
+            self.bits = np.pad(bits, ((pad_n, pad_s), (pad_w, pad_e)))
+            self.origin = (self.origin[0] - 64*pad_w, self.origin[1] - pad_n)
+
+    def next_generation(self, ca, bits):
+        '''Returns the next generation of a bitboard.'''
+        one = np.uint64(1)
+        top = np.uint64(63)
+        # the neighbours to the west and east of each cell, carrying bits across word boundaries
+        west = bits << one
+        west[:, 1:] |= bits[:, :-1] >> top
+        east = bits >> one
+        east[:, :-1] |= bits[:, 1:] << top
+        # add up each row of three neighbours, then add the rows above and below each cell
+        row_sum, row_carry = full_adder(west, bits, east)
+        middle_sum = west ^ east
+        middle_carry = west & east
+        above_sum = np.zeros_like(bits)
+        above_carry = np.zeros_like(bits)
+        below_sum = np.zeros_like(bits)
+        below_carry = np.zeros_like(bits)
+        above_sum[1:] = row_sum[:-1]
+        above_carry[1:] = row_carry[:-1]
+        below_sum[:-1] = row_sum[1:]
+        below_carry[:-1] = row_carry[1:]
+        ones, ones_carry = full_adder(above_sum, middle_sum, below_sum)
+        twos_partial, fours_partial = full_adder(above_carry, middle_carry, below_carry)
+        twos = twos_partial ^ ones_carry
+        fours_carry = twos_partial & ones_carry
+        fours = fours_partial ^ fours_carry
+        eights = fours_partial & fours_carry
+        planes = (ones, twos, fours, eights)
+
+        table = ca.ruletable.reshape(2, 9)
+        next_bits = np.zeros_like(bits)
+        for count in range(9):
+            survive = table[1, count] == 1
+            birth = table[0, count] == 1
+            if ca.mode == 'stable' or (ca.mode == 'semistable' and count == 0):
+                birth = False
+            if not survive and not birth:
+                continue
+            matches = ~np.zeros_like(bits)
+            for bit, plane in enumerate(planes):
+                matches &= plane if count >> bit & 1 else ~plane
+            if survive and birth:
+                next_bits |= matches
+            elif survive:
+                next_bits |= matches & bits
+            else:
+                next_bits |= matches & ~bits
+        return next_bits
+
+    def apply_cutoff(self, bits):
+        '''Removes cells beyond the coordinate cutoff which World.trim applies to random CAs.'''
+        x0, y0 = self.origin
+        height = bits.shape[0]
+        xs = np.arange(64 * bits.shape[1]) + x0
+        bits &= self.pack(((xs >= -120) & (xs <= 120))[np.newaxis])
+        bits[:max(0, min(height, -120 - y0))] = 0
+        bits[max(0, 121 - y0):] = 0
+
+    def step(self, world):
+        '''Runs one step of the cellular automata, updating the grid and changeset of the world.'''
+        if self.bits is None:
+            self.load(world)
+        if world.CA.mode == 'semistable':
+            self.grow()
+        old_bits = self.bits
+        new_bits = self.next_generation(world.CA, old_bits)
+        if world.CA_type == 'random':
+            self.apply_cutoff(new_bits)
+        self.bits = new_bits
+
+        rows, words = np.nonzero(old_bits ^ new_bits)
+        changed = self.unpack((old_bits ^ new_bits)[rows, words][:, np.newaxis])
+        changed_words, offsets = np.nonzero(changed)
+        rows = rows[changed_words]
+        words = words[changed_words]
+        states = ((new_bits[rows, words] >> offsets.astype(np.uint64)) & np.uint64(1)).tolist()
+        xs = (64*words + offsets + self.origin[0]).tolist()
+        ys = (rows + self.origin[1]).tolist()
+        world.changeset = dict()
+        for coord, state in zip(zip(xs, ys), states):
+            if state == 0:
+                del world.grid[coord]
+            else:
+                world.grid[coord] = state
+            world.changeset[coord] = 1 - state
+
+
+class TiledEngine:
+    '''
+    Steps a World by copying its live regions into fixed size NumPy tiles, keyed by tile coordinate.
+
+    This speeds up stepping rather than storage. The grid of the world is kept as well, so every live cell is held
+    twice and the tiles cost memory on top of the grid. Only tiles near live cells are allocated, so unlike the
+    numpy engine the empty space between distant live regions is not, and a tile is only stepped if it, or one of
+    its neighbours, changed in the previous step.
+    '''
+    def __init__(self, world, tile_size=64):
+        '''
+        Kwargs:
+
+        * tile_size (int):
+            The width and height of each tile.
+        '''
+        if world.CA.mode != 'stable' and world.CA.mode != 'semistable':
+            raise Exception('The tiled engine requires a stable or semistable CA')
+        self.tile_size = tile_size
+        self.tiles = None
+        self.active = None  # the keys of the tiles to be stepped next
+
+    def invalidate(self):
+        '''Forgets the tiles so that they are reloaded from the grid on the next step.'''
+        self.tiles = None
+
+    def load(self, world):
+        '''Splits the grid of the world into tiles, all of which are active along with their neighbours.'''
+        size = self.tile_size
+        self.tiles = dict()
+        live = [coord for coord, state in world.grid.items() if state != 0]
+        if live:
+            coords = np.array(live, dtype=np.int64)
+            states = np.array([world.grid[coord] for coord in live], dtype=np.uint8)
+            keys, inverse = np.unique(coords // size, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            order = np.argsort(inverse, kind='stable')
+            splits = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+            for key, members in zip(keys.tolist(), np.split(order, splits)):
+                tile = np.zeros((size, size), dtype=np.uint8)
+                offsets = coords[members] % size
+                tile[offsets[:, 1], offsets[:, 0]] = states[members]
+                self.tiles[tuple(key)] = tile
+        self.active = set(self.tiles)
+        for key in self.tiles:
+            self.active.update(self.neighbour_keys(key))
+
+    def neighbour_keys(self, key):
+        '''Returns the keys of the tiles surrounding a tile.'''
+        tx, ty = key
+        return [(tx + x, ty + y) for x in (-1, 0, 1) for y in (-1, 0, 1) if x != 0 or y != 0]
+
+    def surround(self, key):
+        '''Returns a tile with a one cell border taken from its neighbouring tiles.'''
+        size = self.tile_size
+        tx, ty = key
+        window = np.zeros((size + 2, size + 2), dtype=np.uint8)
+        tiles = self.tiles
+        for x in (-1, 0, 1):
+            for y in (-1, 0, 1):
+                tile = tiles.get((tx + x, ty + y))
+                if tile is None:
+                    continue
+                # the rows and columns of the neighbour which fall inside the window
+                source_y = slice(size - 1, size) if y < 0 else slice(0, 1) if y > 0 else slice(None)
+                source_x = slice(size - 1, size) if x < 0 else slice(0, 1) if x > 0 else slice(None)
+                target_y = slice(0, 1) if y < 0 else slice(size + 1, size + 2) if y > 0 else slice(1, size + 1)
+                target_x = slice(0, 1) if x < 0 else slice(size + 1, size + 2) if x > 0 else slice(1, size + 1)
+                window[target_y, target_x] = tile[source_y, source_x]
+        return window
+
+    def step(self, world):
+        '''Runs one step of the cellular automata on the active tiles, updating the grid and changeset.'''
+        if self.tiles is None:
+            self.load(world)
+        size = self.tile_size
+        # empty space can only come alive next to live cells, so missing tiles are not needed in stable mode
+        if world.CA.mode == 'stable':
+            keys = [key for key in self.active if key in self.tiles]
+        else:
+            keys = list(self.active)
+        world.changeset = dict()
+        if not keys:
+            self.active = set()
+            return
+        windows = np.stack([self.surround(key) for key in keys])
+        new_tiles = next_generation(world.CA, windows)[:, 1:-1, 1:-1]
+
+        self.active = set()
+        for key, new_tile in zip(keys, new_tiles):
+            if world.CA_type == 'random':
+                apply_cutoff(new_tile, (key[0] * size, key[1] * size))
+            old_tile = self.tiles.get(key)
+            if old_tile is None:
+                if not new_tile.any():
+                    continue
+                old_tile = np.zeros((size, size), dtype=np.uint8)
+            ys, xs = np.nonzero(new_tile != old_tile)
+            if len(xs) == 0:
+                continue
+            states = new_tile[ys, xs].tolist()
+            old_states = old_tile[ys, xs].tolist()
+            xs = (xs + key[0] * size).tolist()
+            ys = (ys + key[1] * size).tolist()
+            for coord, state, old_state in zip(zip(xs, ys), states, old_states):
+                if state == 0:
+                    del world.grid[coord]
+                else:
+                    world.grid[coord] = state
+                world.changeset[coord] = old_state
+            # the windows have already been taken, so the tile can be replaced while its neighbours are stepped
+            if new_tile.any():
+                self.tiles[key] = new_tile.copy()
+            else:
+                del self.tiles[key]
+            self.active.add(key)
+            self.active.update(self.neighbour_keys(key))
+
+
+class IncrementalEngine:
+    '''
+    Steps a World by keeping the neighbourhood of every cell next to a live cell from one step to the next.
+
+    The neighbourhood of a cell is stored as a single code, sum(count[s] * 9**(n-1-s)) for the n states of the CA,
+    so that state * 9**(n-1) + code is its position in the rule table. After each step only the neighbours of
+    the cells in the changeset have their codes updated, and only the changed cells and their neighbours are
+    evaluated in the next step, so the cost of a step depends on how much changes rather than on the population.
+    '''
+    def __init__(self, world):
+        if world.CA.mode != 'stable' and world.CA.mode != 'semistable':
+            raise Exception('The incremental engine requires a stable or semistable CA')
+        self.codes = None  # maps cells with at least one live neighbour to their neighbourhood codes
+        self.scheduled = None  # the cells which may change in the next step
+        self.CA = None
+
+    def invalidate(self):
+        '''Forgets the neighbourhood codes so that they are rebuilt from the grid on the next step.'''
+        self.codes = None
+
+    def set_CA(self, ca):
+        '''Prepares the weight of each state and the lookup table for a CA.'''
+        self.CA = ca
+        n = len(ca.states)
+        self.state_stride = 9**(n-1)
+        self.weights = [0] + [9**(n-1-state) for state in range(1, n)]
+        self.table = ca.ruletable.tolist() if ca.ruletable is not None else None
+        self.results = dict()  # next states found from the rule of a CA with no rule table
+
+    def load(self, world):
+        '''Builds the neighbourhood codes from the grid of a world and schedules every cell.'''
+        if world.CA is not self.CA:
+            self.set_CA(world.CA)
+        weights = self.weights
+        codes = dict()
+        for (x, y), state in world.grid.items():
+            if state == 0:
+                continue
+            weight = weights[state]
+            for dx, dy in neighbour_offsets:
+                neighbour = (x + dx, y + dy)
+                codes[neighbour] = codes.get(neighbour, 0) + weight
+        self.codes = codes
+        self.scheduled = set(world.grid)
+        if world.CA.mode == 'semistable':
+            self.scheduled.update(codes)
+
+    def next_state(self, state, code):
+        '''Returns the next state of a cell from the rule of a CA with no rule table.'''
+        key = state * self.state_stride + code
+        result = self.results.get(key)
+        if result is None:
+            nbhd_state = dict()
+            for neighbour_state in reversed(range(1, len(self.CA.states))):
+                code, nbhd_state[neighbour_state] = divmod(code, 9)
+            nbhd_state[0] = 8 - sum(nbhd_state.values())
+            result = self.CA.rule(state, nbhd_state)
+            self.results[key] = result
+        return result
+
+    def step(self, world):
+        '''Runs one step of the cellular automata on the scheduled cells, updating the grid and changeset.'''
+        if self.codes is None or world.CA is not self.CA:
+            self.load(world)
+        grid = world.grid
+        codes = self.codes
+        table = self.table
+        stride = self.state_stride
+        stable = world.CA.mode == 'stable'
+        cutoff = world.CA_type == 'random'
+        changes = []
+        for coord in self.scheduled:
+            state = grid.get(coord, 0)
+            code = codes.get(coord, 0)
+            if state == 0 and (stable or code == 0):
+                continue
+            if cutoff and (max(coord) > 120 or min(coord) < -120):
+                new_state = 0
+            elif table is not None:
+                new_state = table[state * stride + code]
+            else:
+                new_state = self.next_state(state, code)
+            if new_state != state:
+                changes.append((coord, state, new_state))
+
+        # the codes are only updated once every scheduled cell has been evaluated
+        weights = self.weights
+        world.changeset = dict()
+        scheduled = set()
+        for coord, state, new_state in changes:
+            if new_state == 0:
+                del grid[coord]
+            else:
+                grid[coord] = new_state
+            world.changeset[coord] = state
+            scheduled.add(coord)
+            delta = weights[new_state] - weights[state]
+            x, y = coord
+            for dx, dy in neighbour_offsets:
+                neighbour = (x + dx, y + dy)
+                code = codes.get(neighbour, 0) + delta
+                if code == 0:
+                    codes.pop(neighbour, None)
+                else:
+                    codes[neighbour] = code
+                scheduled.add(neighbour)
+        self.scheduled = scheduled
@@ -0,0 +1,207 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import wireworld
+
+
+# the outcomes of running a rule, stored in the status column by their index
+statuses = ('running', 'died', 'static', 'periodic', 'runaway')
+
+# the columns written for every rule, along with their types
+columns = (('seed', np.int64),
+           ('status', np.uint8),
+           ('generations', np.int32),
+           ('initial_population', np.int32),
+           ('final_population', np.int32),
+           ('peak_population', np.int32),
+           ('population_growth', np.float32),
+           ('mean_changes', np.float32),
+           ('initial_extent', np.int32),
+           ('final_extent', np.int32),
+           ('extent_growth', np.float32),
+           ('transient', np.int32),
+           ('period', np.int32))
+
+
+def soup(size=16, n_states=3, density=0.5, seed=0):
+    '''
+    Returns the content of a square world filled with randomly chosen live cells.
+
+    Args:
+
+    * size (int):
+        The width and height of the square.
+    * n_states (int):
+        The number of states of the CA, live cells are given a state from 1 to n_states-1.
+    * density (float):
+        The probability that a cell is live.
+    * seed (int):
+        Seeds the random choices, so the same soup can be recreated.
+    '''
+    rng = np.random.default_rng(seed)
+    states = rng.integers(1, n_states, size=(size, size))
+    states[rng.random((size, size)) >= density] = 0
+    ys, xs = np.nonzero(states)
+    return {(int(x), int(y)): int(states[y, x]) for x, y in zip(xs, ys)}
+
+
+def extent(world):
+    '''Returns the larger of the width and height of the bounding box of the live cells.'''
+    bounds = world.getbounds()
+    if bounds is None:
+        return 0
+    (x_min, x_max), (y_min, y_max) = bounds
+    return max(x_max - x_min, y_max - y_min) + 1
+
+
+def run_rule(task):
+    '''
+    Generates a random rule and runs it on a seed world, returning the metrics for one row of the results.
+
+    Args:
+
+    * task (tuple):
+        The seed of the rule, the number of states, the content of the seed world, the number of steps, the
+        engine and the population and extent beyond which the rule is abandoned as a runaway.
+    Returns:
+        dict, mapping each of the columns to its value, with the rule table of the CA under 'table'.
+    '''
+    seed, n_states, content, steps, engine, max_population, max_extent = task
+    ca = wireworld.CA(states=n_states, getrandom=True, seed=seed)
+    world = wireworld.World(content=dict(content), CA=ca, CA_type='random', engine=engine)
+    initial_population = world.livecellcount()
+    initial_extent = extent(world)
+    peak_population = initial_population
+    total_changes = 0
+    status = 'running'
+    generations = 0
+    while generations < steps:
+        world.step()
+        generations += 1
+        total_changes += len(world.changeset)
+        population = world.livecellcount()
+        peak_population = max(peak_population, population)
+        if population == 0:
+            status = 'died'
+        elif not world.changeset:
+            status = 'static'
+        elif world.cycle is not None:
+            status = 'periodic'
+        elif population > max_population or extent(world) > max_extent:
+            status = 'runaway'
+        if status != 'running':
+            break
+    final_population = world.livecellcount()
+    final_extent = extent(world)
+    transient, period = world.cycle if world.cycle is not None else (-1, -1)
+    return {'seed': seed,
+            'status': statuses.index(status),
+            'generations': generations,
+            'initial_population': initial_population,
+            'final_population': final_population,
+            'peak_population': peak_population,
+            'population_growth': final_population / max(initial_population, 1),
+            'mean_changes': total_changes / max(generations, 1),
+            'initial_extent': initial_extent,
+            'final_extent': final_extent,
+            'extent_growth': final_extent / max(initial_extent, 1),
+            'transient': transient,
+            'period': period,
+            'table': ca.ruletable}
+
+
+def run_ensemble(n_rules, n_states=3, steps=200, content=None, seed=0, workers=None, engine='numpy',
+                 max_population=4000, max_extent=96, chunksize=16):
+    '''
+    Runs many random rules on the same seed world, spread across a pool of processes.
+
+    Args:
+
+    * n_rules (int):
+        The number of random rules to try.
+
+    Kwargs:
+
+    * n_states (int):
+        The number of states of each CA.
+    * steps (int):
+        The most generations to run each rule for.
+    * content (dict or None):
+        The seed world. If None, a soup is generated from the seed.
+    * seed (int):
+        Rule i is generated from seed + i, so any rule can be regenerated on its own.
+    * workers (int or None):
+        The number of processes. If None, one is started for each CPU.
+    * engine (string or None):
+        The engine used to step each world.
+    * max_population (int):
+        A rule is abandoned as a runaway once it has more live cells than this.
+    * max_extent (int):
+        A rule is abandoned as a runaway once its bounding box is wider or taller than this.
+    * chunksize (int):
+        The number of rules sent to a process at once.
+
+    Returns:
+        dict, mapping each of the columns to a numpy array with one entry per rule. The rule tables are stacked
+        under 'tables'.
+    '''
+    if content is None:
+        content = soup(n_states=n_states, seed=seed)
+    tasks = [(seed + index, n_states, content, steps, engine, max_population, max_extent)
+             for index in range(n_rules)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(run_rule, tasks, chunksize=chunksize))
+    results = {name: np.array([row[name] for row in rows], dtype=dtype) for name, dtype in columns}
+    results['tables'] = np.stack([row['table'] for row in rows])
+    return results
+
+
+def save_results(results, outfile):
+    '''Writes the results of an ensemble to a compressed .npz file, with one array for each column.'''
+    np.savez_compressed(outfile, **results)
+
+
+def load_results(infile):
+    '''Reads the results of an ensemble written by save_results.'''
+    with np.load(infile) as data:
+        return {name: data[name] for name in data.files}
+
+
+def rank(results, column, status=None, descending=True):
+    '''
+    Returns the indices of the rules ordered by the value of a column.
+
+    Kwargs:
+
+    * status (string or None):
+        If given, only rules which finished with this status are included.
+    * descending (bool):
+        If True, the rules with the largest values come first.
+    '''
+    indices = np.arange(len(results[column]))
+    if status is not None:
+        indices = indices[results['status'] == statuses.index(status)]
+    order = np.argsort(results[column][indices], kind='stable')
+    if descending:
+        order = order[::-1]
+    return indices[order]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Screens random CA rules on a seed world.')
+    parser.add_argument('outfile', help='the .npz file to write the results to')
+    parser.add_argument('--rules', type=int, default=1000, help='the number of rules to try')
+    parser.add_argument('--states', type=int, default=3, help='the number of states of each CA')
+    parser.add_argument('--steps', type=int, default=200, help='the most generations to run each rule for')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the first rule')
+    parser.add_argument('--workers', type=int, default=None, help='the number of processes')
+    args = parser.parse_args()
+    results = run_ensemble(args.rules, n_states=args.states, steps=args.steps, seed=args.seed,
+                           workers=args.workers)
+    save_results(results, args.outfile)
+    counts = np.bincount(results['status'], minlength=len(statuses))
+    print(', '.join('{} {}'.format(count, status) for status, count in zip(statuses, counts)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+'''
+Reading and writing the RLE and Macrocell formats used by Golly, for wireworld and the game of life.
+
+Files are read and written a line at a time, so the text of a large pattern is never held in memory, only its
+cells. The readers return the live cells as a grid along with the CA_type the rule of the file corresponds to.
+'''
+import re
+import hashlife
+
+
+# the rule written for each CA_type, and the number of states it has
+rule_names = {'wireworld': 'WireWorld', 'life': 'B3/S23'}
+rule_states = {'wireworld': 4, 'life': 2}
+# the CA_type of each rule which may be read, in lower case
+rule_types = {'wireworld': 'wireworld', 'b3/s23': 'life', '23/3': 'life'}
+
+line_length = 70  # the longest line written in an RLE file
+header_pattern = re.compile(r'x\s*=\s*(-?\d+)\s*,\s*y\s*=\s*(-?\d+)(?:\s*,\s*rule\s*=\s*([^\s,]+))?')
+token_pattern = re.compile(r'(\d*)([!$.A-Xbo]|[p-y][A-X])')
+carry_pattern = re.compile(r'\d*[p-y]?')
+
+
+def rule_type(rule):
+    '''Returns the CA_type of a Golly rule string, ignoring any topology suffix.'''
+    name = rule.split(':')[0].lower()
+    if name not in rule_types:
+        raise Exception('Unsupported rule: {}'.format(rule))
+    return rule_types[name]
+
+
+def check_type(CA_type):
+    '''Raises an exception if a CA_type has no Golly rule.'''
+    if CA_type not in rule_names:
+        raise Exception('Only wireworld and life worlds may be saved in Golly formats')
+
+
+def symbol_state(symbol):
+    '''Returns the state of a cell symbol in an RLE file.'''
+    if symbol == 'b' or symbol == '.':
+        return 0
+    if symbol == 'o':
+        return 1
+    if len(symbol) == 1:
+        return ord(symbol) - ord('A') + 1
+    return 24 * (ord(symbol[0]) - ord('p') + 1) + ord(symbol[1]) - ord('A') + 1
+
+
+def state_symbol(state, n_states):
+    '''Returns the RLE symbol of a state, using b and o for two state rules.'''
+    if n_states == 2:
+        return 'o' if state else 'b'
+    if state == 0:
+        return '.'
+    prefix, letter = divmod(state - 1, 24)
+    return ('' if prefix == 0 else chr(ord('p') + prefix - 1)) + chr(ord('A') + letter)
+
+
+def read_rle(infile):
+    '''
+    Reads the cells of an RLE file.
+
+    The top left corner of the pattern is placed at (0, 0), unless the file gives a position in a #CXRLE line.
+
+    Returns:
+        tuple, the grid, the CA_type and the size of the pattern.
+    '''
+    grid = dict()
+    CA_type = 'life'
+    size = (0, 0)
+    x0 = y0 = 0
+    header = False
+    x = y = 0
+    carry = ''
+    with open(infile) as rle_file:
+        for line in rle_file:
+            if not header:
+                if line.startswith('#CXRLE'):
+                    position = re.search(r'Pos\s*=\s*(-?\d+)\s*,\s*(-?\d+)', line)
+                    if position:
+                        x0, y0 = int(position.group(1)), int(position.group(2))
+                        x, y = x0, y0
+                    continue
+                if line.startswith('#') or not line.strip():
+                    continue
+                match = header_pattern.match(line.strip())
+                if not match:
+                    raise Exception('Missing RLE header line')
+                size = (int(match.group(1)), int(match.group(2)))
+                if match.group(3):
+                    CA_type = rule_type(match.group(3))
+                header = True
+                continue
+            text = carry + ''.join(line.split())
+            end = 0
+            for match in token_pattern.finditer(text):
+                if match.start() != end:
+                    break
+                end = match.end()
+                count = int(match.group(1)) if match.group(1) else 1
+                symbol = match.group(2)
+                if symbol == '!':
+                    return grid, CA_type, size
+                if symbol == '$':
+                    x = x0
+                    y += count
+                    continue
+                state = symbol_state(symbol)
+                if state != 0:
+                    for i in range(x, x + count):
+                        grid[(i, y)] = state
+                x += count
+            carry = text[end:]
+            if carry_pattern.fullmatch(carry) is None:
+                raise Exception('Unexpected text in RLE file: {}'.format(carry))
+    return grid, CA_type, size
+
+
+def rle_tokens(grid, n_states):
+    '''Yields the runs of an RLE pattern of live cells row by row, ending with !.'''
+    if not grid:
+        yield '!'
+        return
+    x0 = min(x for x, y in grid)
+    cells = sorted((y, x) for x, y in grid)
+    symbols = [state_symbol(state, n_states) for state in range(n_states)]
+    last_y = cells[0][0]
+    run_state, run_count, next_x = 0, 0, x0
+    for y, x in cells:
+        state = grid[(x, y)]
+        if y != last_y:
+            if run_count:
+                yield (str(run_count) if run_count > 1 else '') + symbols[run_state]
+            rows = y - last_y
+            yield (str(rows) if rows > 1 else '') + '$'
+            run_state, run_count, next_x, last_y = 0, 0, x0, y
+        if x != next_x:
+            # the cells between are dead
+            if run_count and run_state != 0:
+                yield (str(run_count) if run_count > 1 else '') + symbols[run_state]
+                run_count = 0
+            run_state = 0
+            run_count += x - next_x
+        if state != run_state:
+            if run_count:
+                yield (str(run_count) if run_count > 1 else '') + symbols[run_state]
+            run_state, run_count = state, 0
+        run_count += 1
+        next_x = x + 1
+    if run_count:
+        yield (str(run_count) if run_count > 1 else '') + symbols[run_state]
+    yield '!'
+
+
+def write_rle(grid, CA_type, outfile, permission='x'):
+    '''Writes the cells of a grid of a wireworld or life world as an RLE file, with lines of at most 70 characters.'''
+    check_type(CA_type)
+    n_states = rule_states[CA_type]
+    live = [coord for coord, state in grid.items() if state != 0]
+    if live:
+        xs, ys = zip(*live)
+        x0, y0 = min(xs), min(ys)
+        size = (max(xs) - x0 + 1, max(ys) - y0 + 1)
+    else:
+        x0, y0 = 0, 0
+        size = (0, 0)
+    with open(outfile, permission) as rle_file:
+        rle_file.write('#CXRLE Pos={},{}\n'.format(x0, y0))
+        rle_file.write('x = {}, y = {}, rule = {}\n'.format(size[0], size[1], rule_names[CA_type]))
+        line = ''
+        for token in rle_tokens({coord: grid[coord] for coord in live}, n_states):
+            if len(line) + len(token) > line_length:
+                rle_file.write(line + '\n')
+                line = ''
+            line += token
+        rle_file.write(line + '\n')
+
+
+def read_leaf(text, tree):
+    '''Returns the level 3 node of an 8 by 8 leaf of a two state Macrocell file, written as rows of . and *.'''
+    cells = []
+    x = y = 0
+    for symbol in text:
+        if symbol == '$':
+            x = 0
+            y += 1
+        else:
+            if symbol == '*':
+                cells.append((x, y, 1))
+            x += 1
+    return tree.build(cells, 3, 0, 0)
+
+
+def write_leaf(node, tree):
+    '''Returns the text of a level 3 node of a two state pattern as an 8 by 8 leaf.'''
+    rows = [['.'] * 8 for _ in range(8)]
+    for (x, y) in tree.node_cells(node, 0, 0):
+        rows[y][x] = '*'
+    text = [''.join(row).rstrip('.') + '$' for row in rows]
+    while text and text[-1] == '$':
+        text.pop()
+    return ''.join(text)
+
+
+def read_macrocell(infile):
+    '''
+    Reads the cells of a Macrocell file.
+
+    The nodes of the quadtree are built as they are read, sharing repeated squares, and the cells are only
+    extracted from the root, which is the last node, once the whole file has been read. The root is centred on
+    (0, 0), as in Golly.
+
+    Returns:
+        tuple, the grid, the CA_type and the size of the pattern.
+    '''
+    CA_type = 'life'
+    tree = None
+    nodes = [None]  # nodes are numbered from 1, 0 stands for an empty node
+    with open(infile) as mc_file:
+        first = mc_file.readline()
+        if not first.startswith('[M2]'):
+            raise Exception('Missing Macrocell header line')
+        for line in mc_file:
+            if line.startswith('#R'):
+                CA_type = rule_type(line[2:].strip())
+                continue
+            if line.startswith('#') or not line.strip():
+                continue
+            if tree is None:
+                tree = hashlife.QuadTree(rule_states[CA_type])
+            if line[0] in '.*$':
+                nodes.append(read_leaf(line.strip(), tree))
+                continue
+            level, *children = [int(value) for value in line.split()]
+            if level == 1:
+                nodes.append(tree.join(*[tree.leaves[state] for state in children]))
+            else:
+                nodes.append(tree.join(*[nodes[child] if child else tree.empty(level - 1)
+                                         for child in children]))
+    if tree is None or len(nodes) == 1:
+        return dict(), CA_type, (0, 0)
+    root = nodes[-1]
+    half = 1 << (root.level - 1)
+    grid = tree.node_cells(root, -half, -half)
+    if not grid:
+        return grid, CA_type, (0, 0)
+    xs, ys = zip(*grid)
+    return grid, CA_type, (max(xs) - min(xs) + 1, max(ys) - min(ys) + 1)
+
+
+def write_macrocell(grid, CA_type, outfile, permission='x'):
+    '''
+    Writes the cells of a grid of a wireworld or life world as a Macrocell file.
+
+    The grid is built into a hash-consed quadtree centred on (0, 0), which is written out node by node with each
+    node after its children, so a repeated square is only written once.
+    '''
+    check_type(CA_type)
+    n_states = rule_states[CA_type]
+    cells = [(x, y, state) for (x, y), state in grid.items() if state != 0]
+    # the lowest level written out, which is the 8 by 8 leaf for two states
+    base = 3 if n_states == 2 else 1
+    level = base
+    if cells:
+        extent = max(max(max(-x, x + 1), max(-y, y + 1)) for x, y, state in cells)
+        while (1 << (level - 1)) < extent:
+            level += 1
+    half = 1 << (level - 1)
+    tree = hashlife.QuadTree(n_states)
+    root = tree.build(cells, level, -half, -half)
+    with open(outfile, permission) as mc_file:
+        mc_file.write('[M2] (WireWorld)\n')
+        mc_file.write('#R {}\n'.format(rule_names[CA_type]))
+        ids = dict()
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node.population == 0 or node in ids:
+                continue
+            if node.level == base:
+                if n_states == 2:
+                    mc_file.write(write_leaf(node, tree) + '\n')
+                else:
+                    mc_file.write('1 {} {} {} {}\n'.format(node.nw.state, node.ne.state, node.sw.state, node.se.state))
+            elif expanded:
+                children = [ids.get(child, 0) for child in (node.nw, node.ne, node.sw, node.se)]
+                mc_file.write('{} {} {} {} {}\n'.format(node.level, *children))
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in (node.se, node.sw, node.ne, node.nw))
+                continue
+            ids[node] = len(ids) + 1
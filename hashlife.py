@@ -0,0 +1,336 @@
+class Node:
+    '''
+    A square of cells in a quadtree.
+
+    A node at level k covers 2**k by 2**k cells and is made up of four nodes at level k-1. Nodes at level 0 are
+    single cells. Nodes are hash-consed by a QuadTree, so two nodes covering identical squares are the same
+    object and may be compared by identity.
+    '''
+    __slots__ = ('level', 'nw', 'ne', 'sw', 'se', 'population', 'state')
+
+    def __init__(self, level, nw=None, ne=None, sw=None, se=None, state=0):
+        self.level = level
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.state = state
+        if level == 0:
+            self.population = int(state != 0)
+        else:
+            self.population = nw.population + ne.population + sw.population + se.population
+
+
+class QuadTree:
+    '''
+    Builds hash-consed quadtrees of Nodes, so that two nodes covering identical squares are the same object.
+    '''
+    def __init__(self, n_states=2):
+        self.reset(n_states)
+
+    def reset(self, n_states):
+        '''Forgets every node, preparing leaves for cells in each of n_states states.'''
+        self.leaves = [Node(0, state=state) for state in range(n_states)]
+        self.nodes = dict()
+        self.empties = [self.leaves[0]]
+
+    def join(self, nw, ne, sw, se):
+        '''Returns the unique node made up of the four given nodes.'''
+        key = (nw, ne, sw, se)
+        node = self.nodes.get(key)
+        if node is None:
+            node = Node(nw.level + 1, nw, ne, sw, se)
+            self.nodes[key] = node
+        return node
+
+    def empty(self, level):
+        '''Returns the empty node at the given level.'''
+        while len(self.empties) <= level:
+            smaller = self.empties[-1]
+            self.empties.append(self.join(smaller, smaller, smaller, smaller))
+        return self.empties[level]
+
+    def build(self, cells, level, x, y):
+        '''Returns the node at the given level whose top left cell is (x, y), containing the listed cells.'''
+        if not cells:
+            return self.empty(level)
+        if level == 0:
+            return self.leaves[cells[0][2]]
+        half = 1 << (level - 1)
+        quarters = ([], [], [], [])
+        for cell in cells:
+            quarters[(cell[0] >= x + half) + 2*(cell[1] >= y + half)].append(cell)
+        return self.join(self.build(quarters[0], level - 1, x, y),
+                         self.build(quarters[1], level - 1, x + half, y),
+                         self.build(quarters[2], level - 1, x, y + half),
+                         self.build(quarters[3], level - 1, x + half, y + half))
+
+    def node_cells(self, root, x, y):
+        '''Returns the live cells of a node whose top left cell is (x, y) as a grid.'''
+        grid = dict()
+        stack = [(root, x, y)]
+        while stack:
+            node, x, y = stack.pop()
+            if node.population == 0:
+                continue
+            if node.level == 0:
+                grid[(x, y)] = node.state
+                continue
+            half = 1 << (node.level - 1)
+            stack.append((node.nw, x, y))
+            stack.append((node.ne, x + half, y))
+            stack.append((node.sw, x, y + half))
+            stack.append((node.se, x + half, y + half))
+        return grid
+
+
+class HashLifeEngine(QuadTree):
+    '''
+    Steps a World with Gosper's HashLife algorithm.
+
+    The world is stored as a quadtree of hash-consed nodes and the result of advancing each node is memoized, so
+    repetitive patterns can be advanced by 2**k generations in a single jump with World.advance.
+
+    Random CAs have every cell beyond the coordinate cutoff emptied after each generation, as in World.step, so
+    they are advanced one generation at a time.
+    '''
+    def __init__(self, world, max_nodes=1000000, eviction='reachable'):
+        '''
+        Kwargs:
+
+        * max_nodes (int or None):
+            The number of nodes which may be stored before the caches are cleared. If None, the caches grow without
+            limit.
+        * eviction (string):
+            What is cleared when there are too many nodes. Either way, any node not reachable from the current
+            pattern is dropped. If 'reachable', all memoized results are dropped as well. If 'results', the results
+            of the nodes which are still reachable are kept, along with the nodes they lead to, unless they would
+            fill more than half of max_nodes.
+        '''
+        if eviction != 'reachable' and eviction != 'results':
+            raise Exception('eviction should be either "reachable" or "results"')
+        self.max_nodes = max_nodes
+        self.eviction = eviction
+        self.root = None
+        self.origin = None  # the world coordinate of the top left cell of the root
+        self.set_CA(world.CA)
+
+    def set_CA(self, ca):
+        '''Prepares the lookup table for a CA and clears every cache, raising an exception if it cannot be run.'''
+        if ca.mode != 'stable' and ca.mode != 'semistable':
+            raise Exception('The hashlife engine requires a stable or semistable CA')
+        if ca.ruletable is None:
+            raise Exception('The hashlife engine requires a CA with a compiled rule table')
+        self.CA = ca
+        n = len(ca.states)
+        self.table = ca.ruletable.tolist()
+        self.state_stride = 9**(n-1)
+        # the contribution of a neighbour in each state to the index of the rule table
+        self.weights = [0] + [9**(n-1-state) for state in range(1, n)]
+        self.reset(n)
+        self.results = dict()
+
+    def invalidate(self):
+        '''Forgets the quadtree so that it is rebuilt from the grid on the next step, memoized results are kept.'''
+        self.root = None
+
+    def load(self, world):
+        '''Builds the quadtree from the grid of a world.'''
+        if world.CA is not self.CA:
+            self.set_CA(world.CA)
+        bounds = world.getbounds()
+        if bounds is None:
+            bounds = ((0, 0), (0, 0))
+        (x_min, x_max), (y_min, y_max) = bounds
+        level = max(x_max - x_min, y_max - y_min, 1).bit_length()
+        cells = [(x, y, state) for (x, y), state in world.grid.items() if state != 0]
+        self.root = self.build(cells, level, x_min, y_min)
+        self.origin = (x_min, y_min)
+
+    def cells(self):
+        '''Returns the live cells of the quadtree as a grid.'''
+        return self.node_cells(self.root, self.origin[0], self.origin[1])
+
+    def expand(self):
+        '''Surrounds the root with empty space, doubling its size while keeping the pattern in place.'''
+        root = self.root
+        border = self.empty(root.level - 1)
+        self.root = self.join(self.join(border, border, border, root.nw),
+                              self.join(border, border, root.ne, border),
+                              self.join(border, root.sw, border, border),
+                              self.join(root.se, border, border, border))
+        half = 1 << (root.level - 1)
+        self.origin = (self.origin[0] - half, self.origin[1] - half)
+
+    def is_padded(self):
+        '''Checks that the pattern is contained in the central sixteenth of the root.'''
+        root = self.root
+        return (root.nw.population == root.nw.se.se.population and
+                root.ne.population == root.ne.sw.sw.population and
+                root.sw.population == root.sw.ne.ne.population and
+                root.se.population == root.se.nw.nw.population)
+
+    def centre(self, node):
+        '''Returns the node one level down at the centre of a node.'''
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def centre_h(self, w, e):
+        '''Returns the node centred between two horizontally adjacent nodes.'''
+        return self.join(w.ne, e.nw, w.se, e.sw)
+
+    def centre_v(self, n, s):
+        '''Returns the node centred between two vertically adjacent nodes.'''
+        return self.join(n.sw, n.se, s.nw, s.ne)
+
+    def base_step(self, node):
+        '''Returns the centre of a level 2 node advanced by one generation.'''
+        states = []
+        for row in ((node.nw.nw, node.nw.ne, node.ne.nw, node.ne.ne),
+                    (node.nw.sw, node.nw.se, node.ne.sw, node.ne.se),
+                    (node.sw.nw, node.sw.ne, node.se.nw, node.se.ne),
+                    (node.sw.sw, node.sw.se, node.se.sw, node.se.se)):
+            states.append([leaf.state for leaf in row])
+        weights = self.weights
+        stable = self.CA.mode == 'stable'
+        new_leaves = []
+        for y, x in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            state = states[y][x]
+            nbhd_index = (weights[states[y-1][x-1]] + weights[states[y-1][x]] + weights[states[y-1][x+1]] +
+                          weights[states[y][x-1]] + weights[states[y][x+1]] +
+                          weights[states[y+1][x-1]] + weights[states[y+1][x]] + weights[states[y+1][x+1]])
+            if state == 0 and (stable or nbhd_index == 0):
+                new_state = 0
+            else:
+                new_state = self.table[state * self.state_stride + nbhd_index]
+            new_leaves.append(self.leaves[new_state])
+        return self.join(*new_leaves)
+
+    def advance_node(self, node, j):
+        '''
+        Returns the centre of a node advanced by 2**j generations.
+
+        Args:
+
+        * node (Node):
+            A node at level k, where k is at least 2.
+        * j (int):
+            The log base 2 of the number of generations to advance, which must not exceed k-2.
+        Returns:
+            Node at level k-1
+        '''
+        if node.population == 0:
+            return self.empty(node.level - 1)
+        key = (node, j)
+        result = self.results.get(key)
+        if result is not None:
+            return result
+        if node.level == 2:
+            result = self.base_step(node)
+        else:
+            sub_level = node.level - 1
+            nine = (node.nw, self.centre_h(node.nw, node.ne), node.ne,
+                    self.centre_v(node.nw, node.sw), self.centre(node), self.centre_v(node.ne, node.se),
+                    node.sw, self.centre_h(node.sw, node.se), node.se)
+            if j == node.level - 2:
+                # advance halfway on the way down, the rest of the way is covered below
+                nine = [self.advance_node(sub_node, sub_level - 2) for sub_node in nine]
+                j = sub_level - 2
+            else:
+                nine = [self.centre(sub_node) for sub_node in nine]
+            c00, c01, c02, c10, c11, c12, c20, c21, c22 = nine
+            result = self.join(self.advance_node(self.join(c00, c01, c10, c11), j),
+                               self.advance_node(self.join(c01, c02, c11, c12), j),
+                               self.advance_node(self.join(c10, c11, c20, c21), j),
+                               self.advance_node(self.join(c11, c12, c21, c22), j))
+        self.results[key] = result
+        return result
+
+    def jump(self, j):
+        '''Advances the root by 2**j generations.'''
+        while self.root.level < j + 3 or not self.is_padded():
+            self.expand()
+        quarter = 1 << (self.root.level - 2)
+        self.root = self.advance_node(self.root, j)
+        self.origin = (self.origin[0] + quarter, self.origin[1] + quarter)
+
+    def clip(self, node, x, y):
+        '''
+        Returns a node whose top left cell is (x, y) with every cell beyond the coordinate cutoff for random CAs
+        emptied. Only the nodes which straddle the cutoff are rebuilt.
+        '''
+        size = 1 << node.level
+        if node.population == 0 or (x >= -120 and y >= -120 and x + size - 1 <= 120 and y + size - 1 <= 120):
+            return node
+        if x > 120 or y > 120 or x + size - 1 < -120 or y + size - 1 < -120:
+            return self.empty(node.level)
+        half = size >> 1
+        return self.join(self.clip(node.nw, x, y), self.clip(node.ne, x + half, y),
+                         self.clip(node.sw, x, y + half), self.clip(node.se, x + half, y + half))
+
+    def collect(self):
+        '''Clears the caches according to the eviction policy once they hold more than max_nodes nodes.'''
+        if self.max_nodes is None or len(self.nodes) <= self.max_nodes:
+            return
+        results = self.results
+        self.results = dict()
+        self.nodes = dict()
+        self.empties = [self.leaves[0]]
+        self.reinsert(self.root)
+        if self.eviction == 'results':
+            nodes = self.nodes
+            kept = {key: result for key, result in results.items()
+                    if nodes.get((key[0].nw, key[0].ne, key[0].sw, key[0].se)) is key[0]}
+            for result in kept.values():
+                self.reinsert(result)
+            if len(nodes) <= self.max_nodes // 2:
+                self.results = kept
+            else:
+                self.nodes = dict()
+                self.reinsert(self.root)
+
+    def reinsert(self, root):
+        '''Adds a node and all of its descendants back into the node table.'''
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.level == 0:
+                continue
+            key = (node.nw, node.ne, node.sw, node.se)
+            if key not in self.nodes:
+                self.nodes[key] = node
+                stack.extend(key)
+
+    def step(self, world):
+        '''Runs one step of the cellular automata, updating the grid and changeset of the world.'''
+        self.advance(world, 1)
+
+    def advance(self, world, n):
+        '''
+        Runs n steps of the cellular automata, jumping 2**j generations for each binary digit j of n, or one
+        generation at a time with the coordinate cutoff applied for random CAs.
+        '''
+        if self.root is None or world.CA is not self.CA:
+            self.load(world)
+        if world.CA_type == 'random':
+            for _ in range(n):
+                self.jump(0)
+                self.root = self.clip(self.root, *self.origin)
+                self.collect()
+        else:
+            j = 0
+            while n:
+                if n & 1:
+                    self.jump(j)
+                    self.collect()
+                n >>= 1
+                j += 1
+        grid = self.cells()
+        changeset = dict()
+        for coord, state in world.grid.items():
+            if grid.get(coord, 0) != state:
+                changeset[coord] = state
+        for coord in grid:
+            if coord not in world.grid:
+                changeset[coord] = 0
+        world.grid = grid
+        world.changeset = changeset
@@ -0,0 +1,282 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import threading
+import numpy as np
+import engines
+
+
+# commands which the main process leaves in the control array for the workers
+RUN = 0
+STOP = 1
+
+
+class TableCA:
+    '''The parts of a CA needed by engines.next_generation, without the rule function, so it can be sent to a worker.'''
+    def __init__(self, ca):
+        self.states = ca.states
+        self.mode = ca.mode
+        self.ruletable = ca.ruletable
+        self.rule = None
+
+
+def worker(names, shape, band, ca, cutoff_origin, sync, band_sync):
+    '''
+    Steps one band of rows of a world held in shared memory.
+
+    Args:
+
+    * names (tuple):
+        The names of the shared memory blocks for the two generation buffers, the start buffer, the control array and
+        the changed flags.
+    * shape (tuple):
+        The shape of the generation buffers.
+    * band (tuple):
+        The index of this band, followed by its first row and the row after its last.
+    * ca (TableCA):
+        The CA to be run.
+    * cutoff_origin (tuple or None):
+        The world coordinate of the top left cell, if the coordinate cutoff for random CAs should be applied.
+    * sync (multiprocessing.Barrier):
+        Shared with the main process, waited on before and after each run of generations.
+    * band_sync (multiprocessing.Barrier):
+        Shared with the other workers, waited on between generations so no band is read while it is being written.
+    '''
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    buffers = [np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for block in blocks[:3]]
+    start = buffers.pop()
+    control = np.ndarray((3,), dtype=np.int64, buffer=blocks[3].buf)
+    changed = np.ndarray((band_sync.parties,), dtype=np.uint8, buffer=blocks[4].buf)
+    index, first_row, last_row = band
+    window_start = max(first_row - 1, 0)
+    window_end = min(last_row + 1, shape[0])
+    try:
+        while True:
+            sync.wait()
+            if control[0] == STOP:
+                break
+            parity = int(control[2])
+            for _ in range(control[1]):
+                source = buffers[parity]
+                target = buffers[1 - parity]
+                if first_row < last_row:
+                    # the rows either side of the band are the halo, written by the neighbouring workers
+                    new_rows = engines.next_generation(ca, source[window_start:window_end])
+                    new_rows = new_rows[first_row - window_start:last_row - window_start]
+                    if cutoff_origin is not None:
+                        x0, y0 = cutoff_origin
+                        engines.apply_cutoff(new_rows, (x0, y0 + first_row))
+                    if not changed[index] and (new_rows != source[first_row:last_row]).any():
+                        # the band is saved as it was before its first change, for the main process to diff against
+                        start[first_row:last_row] = source[first_row:last_row]
+                        changed[index] = 1
+                    target[first_row:last_row] = new_rows
+                band_sync.wait()
+                parity = 1 - parity
+            sync.wait()
+    except Exception:
+        sync.abort()
+        band_sync.abort()
+        raise
+    finally:
+        del buffers, start, control, changed
+        for block in blocks:
+            block.close()
+
+
+class ParallelEngine:
+    '''
+    Steps a World by splitting its bounding box into bands of rows, each stepped by its own worker process.
+
+    The array is held in shared memory with one buffer for the current generation and one for the next. After each
+    generation the workers wait at a barrier, so every band can then read the edge rows of its neighbours as a
+    halo. Each worker also saves its band into a third buffer the first time it changes, so that only the bands
+    which changed are compared to find the changeset. Results are identical to those of the DenseEngine.
+    '''
+    margin = 32  # the number of empty cells added to each side when the array is loaded
+
+    def __init__(self, world, workers=None):
+        '''
+        Kwargs:
+
+        * workers (int or None):
+            The number of worker processes. If None, one is started for each CPU.
+        '''
+        if world.CA.mode != 'stable' and world.CA.mode != 'semistable':
+            raise Exception('The parallel engine requires a stable or semistable CA')
+        if world.CA.ruletable is None:
+            raise Exception('The parallel engine requires a CA with a compiled rule table')
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = workers
+        self.blocks = None
+        self.processes = None
+        self.origin = None
+
+    def __getstate__(self):
+        '''Copies of the engine start their own workers when they are first stepped.'''
+        return {'workers': self.workers, 'blocks': None, 'processes': None, 'origin': None}
+
+    def __del__(self):
+        try:
+            self.close(wait=False)
+        except Exception:
+            pass
+
+    def invalidate(self):
+        '''Stops the workers so that the array is reloaded from the grid on the next step.'''
+        self.close()
+
+    def close(self, wait=True):
+        '''
+        Stops the workers and releases the shared memory.
+
+        If wait is False, or any worker has already stopped, the workers are terminated rather than being asked to
+        finish, since waiting at the barrier would then never return.
+        '''
+        if self.processes is not None:
+            if wait and all(process.is_alive() for process in self.processes):
+                self.control[0] = STOP
+                try:
+                    self.sync.wait(timeout=10)
+                except threading.BrokenBarrierError:
+                    pass
+            for process in self.processes:
+                process.join(timeout=1 if wait else 0)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            self.processes = None
+            del self.sync, self.band_sync
+        if self.blocks is not None:
+            del self.buffers, self.start, self.control, self.changed
+            for block in self.blocks:
+                block.close()
+                block.unlink()
+            self.blocks = None
+
+    def load(self, world, bounds=None):
+        '''
+        Loads the grid of the world into shared memory and starts the workers.
+
+        The bounds of the live cells are taken from the world unless given, since the world only updates them once a
+        step has been recorded.
+        '''
+        if bounds is None:
+            bounds = world.getbounds()
+        if bounds is None:
+            bounds = ((0, 0), (0, 0))
+        (x_min, x_max), (y_min, y_max) = bounds
+        self.origin = (x_min - self.margin, y_min - self.margin)
+        shape = (y_max - y_min + 1 + 2*self.margin, x_max - x_min + 1 + 2*self.margin)
+        size = shape[0] * shape[1]
+        self.blocks = [shared_memory.SharedMemory(create=True, size=size),
+                       shared_memory.SharedMemory(create=True, size=size),
+                       shared_memory.SharedMemory(create=True, size=size),
+                       shared_memory.SharedMemory(create=True, size=3*8),
+                       shared_memory.SharedMemory(create=True, size=self.workers)]
+        self.buffers = [np.ndarray(shape, dtype=np.uint8, buffer=block.buf) for block in self.blocks[:2]]
+        self.start = np.ndarray(shape, dtype=np.uint8, buffer=self.blocks[2].buf)
+        self.control = np.ndarray((3,), dtype=np.int64, buffer=self.blocks[3].buf)
+        self.changed = np.ndarray((self.workers,), dtype=np.uint8, buffer=self.blocks[4].buf)
+        self.buffers[0][:] = 0
+        self.buffers[1][:] = 0
+        live = [coord for coord, state in world.grid.items() if state != 0]
+        if live:
+            coords = np.array(live, dtype=np.int64)
+            states = np.array([world.grid[coord] for coord in live], dtype=np.uint8)
+            self.buffers[0][coords[:, 1] - self.origin[1], coords[:, 0] - self.origin[0]] = states
+        self.parity = 0
+        self.bands = np.array_split(np.arange(shape[0]), self.workers)
+
+        # both barriers are kept here, their shared state would be reused if they were garbage collected
+        self.sync = multiprocessing.Barrier(self.workers + 1)
+        self.band_sync = multiprocessing.Barrier(self.workers)
+        names = tuple(block.name for block in self.blocks)
+        ca = TableCA(world.CA)
+        cutoff_origin = self.origin if world.CA_type == 'random' else None
+        self.processes = []
+        for index, rows in enumerate(self.bands):
+            band = (index, int(rows[0]) if len(rows) else 0, int(rows[-1]) + 1 if len(rows) else 0)
+            process = multiprocessing.Process(target=worker, daemon=True,
+                                              args=(names, shape, band, ca, cutoff_origin, self.sync,
+                                                    self.band_sync))
+            process.start()
+            self.processes.append(process)
+
+    def headroom(self):
+        '''Returns the number of generations which can be run before a live cell could reach the edge.'''
+        array = self.buffers[self.parity]
+        rows = np.flatnonzero(array.any(axis=1))
+        if len(rows) == 0:
+            return array.shape[0]
+        columns = np.flatnonzero(array.any(axis=0))
+        return min(rows[0], array.shape[0] - 1 - rows[-1], columns[0], array.shape[1] - 1 - columns[-1])
+
+    def live_bounds(self):
+        '''Returns the bounds for the position of the live cells in the current array, which must hold some.'''
+        array = self.buffers[self.parity]
+        rows = np.flatnonzero(array.any(axis=1))
+        columns = np.flatnonzero(array.any(axis=0))
+        x0, y0 = self.origin
+        return (int(columns[0]) + x0, int(columns[-1]) + x0), (int(rows[0]) + y0, int(rows[-1]) + y0)
+
+    def run(self, generations):
+        '''Has the workers run a number of generations.'''
+        self.control[0] = RUN
+        self.control[1] = generations
+        self.control[2] = self.parity
+        self.sync.wait()
+        self.sync.wait()
+        self.parity = (self.parity + generations) % 2
+
+    def step(self, world):
+        '''Runs one step of the cellular automata, updating the grid and changeset of the world.'''
+        self.advance(world, 1)
+
+    def advance(self, world, n):
+        '''Runs n steps of the cellular automata, updating the grid and changeset of the world.'''
+        if self.processes is None:
+            self.load(world)
+        world.changeset = dict()
+        self.changed[:] = 0
+        while n > 0:
+            if world.CA.mode == 'semistable':
+                headroom = self.headroom()
+                if headroom < 1:
+                    # reload with a fresh margin around the live cells
+                    self.sync_grid(world)
+                    bounds = self.live_bounds()
+                    self.close()
+                    self.load(world, bounds)
+                    self.changed[:] = 0
+                    headroom = self.headroom()
+            else:
+                headroom = n
+            generations = min(n, headroom)
+            self.run(generations)
+            n -= generations
+        self.sync_grid(world)
+
+    def sync_grid(self, world):
+        '''
+        Writes the cells which differ from the start buffer into the grid, and adds them to the changeset.
+
+        Only the bands flagged as changed are compared, since the start buffer holds stale rows for the others.
+        '''
+        array = self.buffers[self.parity]
+        start = self.start
+        for rows, changed in zip(self.bands, self.changed.tolist()):
+            if not changed or len(rows) == 0:
+                continue
+            band = slice(rows[0], rows[-1] + 1)
+            ys, xs = np.nonzero(array[band] != start[band])
+            states = array[band][ys, xs].tolist()
+            old_states = start[band][ys, xs].tolist()
+            xs = (xs + self.origin[0]).tolist()
+            ys = (ys + rows[0] + self.origin[1]).tolist()
+            for coord, state, old_state in zip(zip(xs, ys), states, old_states):
+                if state == 0:
+                    world.grid.pop(coord, None)
+                else:
+                    world.grid[coord] = state
+                world.changeset.setdefault(coord, old_state)
@@ -0,0 +1,108 @@
+import collections
+import csv
+import json
+import time
+
+
+# the fields of a step record, in the order they are written by CSVSink. Phases which did not run in a step, and
+# counters which do not apply to it, are left out of the record
+fields = ('generation', 'generations', 'step_time',
+          'frontier_time', 'rules_time', 'graph_time', 'changeset_time', 'engine_time', 'record_time',
+          'cells_examined', 'rule_calls', 'changes', 'live_cells')
+
+
+class Profiler:
+    '''
+    Times the phases of each step of a World and counts the work done, passing one record per step to its sinks.
+
+    A profiler is switched on by setting world.profiler, while it is None the only cost to a step is checking
+    that it is None.
+    '''
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self.record = None
+        self.last = None
+
+    def begin_step(self):
+        '''Starts a new record.'''
+        self.last = time.perf_counter()
+        self.record = {'start': self.last}
+
+    def mark(self, phase):
+        '''Records the time since the last mark, or since the start of the step, as the time taken by a phase.'''
+        now = time.perf_counter()
+        self.record[phase + '_time'] = now - self.last
+        self.last = now
+
+    def count(self, counter, value):
+        '''Records the value of a counter for this step.'''
+        self.record[counter] = value
+
+    def end_step(self, world, generations=1):
+        '''Completes the record for a step, or for a jump of several generations, and passes it to the sinks.'''
+        record = self.record
+        record['step_time'] = time.perf_counter() - record.pop('start')
+        record['generation'] = world.generation
+        record['generations'] = generations
+        record['changes'] = len(world.changeset)
+        record['live_cells'] = world.livecellcount()
+        for sink in self.sinks:
+            sink.write(record)
+        self.record = None
+
+    def close(self):
+        '''Closes every sink.'''
+        for sink in self.sinks:
+            sink.close()
+
+
+class RingBuffer:
+    '''Keeps the most recent step records in memory.'''
+    def __init__(self, size=1000):
+        self.records = collections.deque(maxlen=size)
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+    def mean(self, field):
+        '''Returns the mean of a field over the records which have it, or None if none do.'''
+        values = [record[field] for record in self.records if field in record]
+        if not values:
+            return None
+        return sum(values) / len(values)
+
+    def steps_per_second(self):
+        '''Returns the number of generations run per second of time spent stepping, or None if there are no records.'''
+        seconds = sum(record['step_time'] for record in self.records)
+        if seconds == 0:
+            return None
+        return sum(record['generations'] for record in self.records) / seconds
+
+
+class CSVSink:
+    '''Writes step records to a csv file, with one column for each of the fields.'''
+    def __init__(self, outfile):
+        self.file = open(outfile, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=fields, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+
+    def close(self):
+        self.file.close()
+
+
+class JSONLinesSink:
+    '''Writes each step record to a file as one line of json.'''
+    def __init__(self, outfile):
+        self.file = open(outfile, 'w')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
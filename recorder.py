@@ -0,0 +1,144 @@
+import os
+import numpy as np
+import wireworld
+
+
+# a cell as it is stored in the data file
+cell_dtype = np.dtype([('x', '<i4'), ('y', '<i4'), ('state', 'u1')])
+# an entry of the index file, giving where the cells recorded for a generation are in the data file
+index_dtype = np.dtype([('generation', '<i8'), ('offset', '<i8'), ('count', '<i8'), ('keyframe', '<i8')])
+
+
+class Recorder:
+    '''
+    Records the trajectory of a World as it is stepped.
+
+    Three files are written, named after a base path. path.npz holds the world as it was when recording started,
+    including its CA. path.data is appended to after every recorded step, usually with the cells in the changeset
+    and their new states, but every keyframe_every generations with every live cell. path.index holds one fixed
+    size entry for each recorded step, so a Trajectory can find any generation without reading the data file.
+    '''
+    def __init__(self, path, world, keyframe_every=100):
+        '''
+        Args:
+
+        * path (string):
+            The base path of the files, which are overwritten.
+        * world (World):
+            The world to record, its current state is the first keyframe.
+
+        Kwargs:
+
+        * keyframe_every (int):
+            The number of generations between keyframes. Seeking replays at most this many generations of changes.
+        '''
+        self.path = path
+        self.world = world
+        self.keyframe_every = keyframe_every
+        if os.path.exists(path + '.npz'):
+            os.remove(path + '.npz')
+        wireworld.save_world(world, path + '.npz')
+        self.data = open(path + '.data', 'wb')
+        self.index = open(path + '.index', 'wb')
+        self.offset = 0
+        self.last_keyframe = None
+        self.record()
+
+    def write(self, cells, keyframe):
+        '''Appends a block of cells to the data file and its entry to the index.'''
+        count = len(cells)
+        block = np.empty(count, dtype=cell_dtype)
+        if count:
+            coords, states = zip(*cells)
+            xs, ys = zip(*coords)
+            block['x'] = xs
+            block['y'] = ys
+            block['state'] = states
+        self.data.write(block.tobytes())
+        entry = np.array([(self.world.generation, self.offset, count, keyframe)], dtype=index_dtype)
+        self.index.write(entry.tobytes())
+        self.offset += block.nbytes
+
+    def record(self):
+        '''Records the current generation of the world, either as a keyframe or as the changes since the last.'''
+        world = self.world
+        if self.last_keyframe is None or world.generation - self.last_keyframe >= self.keyframe_every:
+            self.write([(coord, state) for coord, state in world.grid.items() if state != 0], keyframe=1)
+            self.last_keyframe = world.generation
+        else:
+            self.write([(coord, world.getcoordstate(coord)) for coord in world.changeset], keyframe=0)
+
+    def step(self, n=1):
+        '''Steps the world n times, recording every generation.'''
+        for _ in range(n):
+            self.world.step()
+            self.record()
+
+    def flush(self):
+        self.data.flush()
+        self.index.flush()
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+class Trajectory:
+    '''Reads a trajectory written by a Recorder, reconstructing any recorded generation.'''
+    def __init__(self, path):
+        self.path = path
+        self.index = self.map(path + '.index', index_dtype)
+        self.data = self.map(path + '.data', cell_dtype)
+
+    def map(self, filename, dtype):
+        '''Memory maps a file as an array, an empty file gives an empty array since it cannot be mapped.'''
+        if os.path.getsize(filename) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(filename, dtype=dtype, mode='r')
+
+    @property
+    def generations(self):
+        '''The recorded generations, in order.'''
+        return self.index['generation']
+
+    def cells(self, entry):
+        '''Returns the cells of an index entry as a list of coordinates and a list of states.'''
+        start = entry['offset'] // cell_dtype.itemsize
+        block = self.data[start:start + entry['count']]
+        coords = list(zip(block['x'].tolist(), block['y'].tolist()))
+        return coords, block['state'].tolist()
+
+    def seek(self, generation):
+        '''
+        Returns the grid at a generation, from the nearest keyframe before it and the changes recorded since.
+
+        If the generation itself was not recorded, for example because the world was advanced past it, the grid
+        at the last recorded generation before it is returned.
+        '''
+        position = int(np.searchsorted(self.generations, generation, side='right')) - 1
+        if position < 0:
+            raise Exception('Generation {} is before the start of the trajectory'.format(generation))
+        keyframes = np.flatnonzero(self.index['keyframe'][:position + 1])
+        start = int(keyframes[-1])
+        coords, states = self.cells(self.index[start])
+        grid = dict(zip(coords, states))
+        for entry in self.index[start + 1:position + 1]:
+            coords, states = self.cells(entry)
+            for coord, state in zip(coords, states):
+                if state == 0:
+                    grid.pop(coord, None)
+                else:
+                    grid[coord] = state
+        return grid
+
+    def world(self, generation, engine=None):
+        '''Returns a World at a generation, with the CA of the recorded world.'''
+        initial = wireworld.load_world(self.path + '.npz')
+        grid = self.seek(generation)
+        if isinstance(initial, wireworld.WireWorld):
+            world = wireworld.WireWorld(size=initial.size, content=grid, engine=engine)
+        else:
+            world = wireworld.World(size=initial.size, content=grid, CA=initial.CA, CA_type=initial.CA_type,
+                                    engine=engine)
+        world.generation = int(self.generations[np.searchsorted(self.generations, generation, side='right') - 1])
+        return world
@@ -0,0 +1,198 @@
+'''
+Checks the engines, file formats and history of a World against stepping the grid directly.
+
+Run from the top of the repository with:
+
+    python -m pytest -q
+'''
+import os
+import pytest
+import wireworld
+import batch
+import recorder
+from benchmarks import bench_semistable, workloads
+
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+bundled = ('example_01.json', 'example_05.json', 'count_9.json', 'cool_random_01.json')
+engines = sorted(wireworld.engine_dict)
+
+
+def live(grid):
+    '''Returns the live cells of a grid.'''
+    return {coord: state for coord, state in grid.items() if state != 0}
+
+
+def changes(world):
+    '''Returns the cells of the changeset whose state differs from the state they had before.'''
+    return {coord: state for coord, state in world.changeset.items() if state != world.getcoordstate(coord)}
+
+
+def make_world(make, engine):
+    '''Returns a world made with an engine, skipping the test if the engine does not support its CA.'''
+    options = {'workers': 2} if engine == 'parallel' else None
+    try:
+        return make(engine=engine, engine_options=options)
+    except Exception as error:
+        if engine == 'bitboard' and 'two states' in str(error):
+            pytest.skip(str(error))
+        raise
+
+
+def compare(make, engine, steps):
+    '''Steps a world with an engine and without one, checking the live cells and changesets agree.'''
+    reference = make(engine=None, engine_options=None)
+    world = make_world(make, engine)
+    try:
+        for generation in range(steps):
+            reference.step()
+            world.step()
+            assert live(world.grid) == live(reference.grid), generation
+            assert changes(world) == changes(reference), generation
+        reference.advance(steps)
+        world.advance(steps)
+        assert live(world.grid) == live(reference.grid)
+        assert world.generation == reference.generation
+        assert world.fingerprint == reference.fingerprint
+    finally:
+        if engine == 'parallel':
+            world.engine.close()
+
+
+@pytest.mark.parametrize('engine', engines)
+@pytest.mark.parametrize('name', bundled)
+def test_engine_bundled(name, engine):
+    path = os.path.join(root, name)
+    compare(lambda **kwargs: wireworld.load_world(path, **kwargs), engine, 20)
+
+
+@pytest.mark.parametrize('engine', engines)
+def test_engine_life(engine):
+    content = workloads.life_soup(40, seed=2)
+    compare(lambda **kwargs: wireworld.World(content=content, CA_type='life', **kwargs), engine, 40)
+
+
+@pytest.mark.parametrize('engine', engines)
+def test_engine_random_cutoff(engine):
+    '''A random CA started next to the coordinate cutoff, so that cells are removed as they cross it.'''
+    start = workloads.random_ca_world(1, size=24)
+    content = {(x + 100, y + 100): state for (x, y), state in start.grid.items()}
+    ca = start.CA
+    compare(lambda **kwargs: wireworld.World(content=content, CA=ca, CA_type='random', **kwargs), engine, 15)
+
+
+@pytest.mark.parametrize('extension', ('.json', '.npz', '.rle', '.mc'))
+@pytest.mark.parametrize('name', ('count_9.json', 'cool_random_01.json', 'life'))
+def test_round_trip(name, extension, tmp_path):
+    if name == 'life':
+        world = wireworld.World(content=workloads.life_soup(30), CA_type='life')
+    else:
+        world = wireworld.load_world(os.path.join(root, name))
+    if world.CA_type == 'random' and extension in ('.rle', '.mc'):
+        pytest.skip('Golly files only hold wireworld and the game of life')
+    path = str(tmp_path / ('world' + extension))
+    wireworld.save_world(world, path)
+    loaded = wireworld.load_world(path)
+    assert type(loaded) is type(world)
+    assert loaded.CA_type == world.CA_type
+    assert live(loaded.grid) == live(world.grid)
+    assert loaded.CA.ruledict == world.CA.ruledict
+    world.advance(10)
+    loaded.advance(10)
+    assert live(loaded.grid) == live(world.grid)
+
+
+def test_parse_keys():
+    assert wireworld.parse_keys(['(1, -2)', '(0, 3)'], 2).tolist() == [[1, -2], [0, 3]]
+    for keys in (['(1, 2, 3)'], ['(1,2', '3,4)'], ['(1, x)']):
+        with pytest.raises(Exception):
+            wireworld.parse_keys(keys, 2)
+
+
+@pytest.mark.parametrize('engine', (None, 'numpy'))
+def test_snapshots(engine):
+    world = wireworld.load_world(os.path.join(root, 'count_9.json'), engine=engine)
+    grids = []
+    snapshots = []
+    for _ in range(4):
+        grids.append(live(world.grid))
+        snapshots.append(world.snapshot())
+        world.advance(7)
+        world.editpoint((0, 0))
+    for grid, snapshot in reversed(list(zip(grids, snapshots))):
+        world.restore(snapshot)
+        assert live(world.grid) == grid
+        assert world.generation == snapshot.generation
+    world.restore(snapshots[-1])
+    assert live(world.grid) == grids[-1]
+
+
+def test_undo():
+    world = wireworld.load_world(os.path.join(root, 'example_01.json'))
+    start = live(world.grid)
+    world.editpoint((50, 50), value=3)
+    world.clear_region((0, 0), (5, 5))
+    edited = live(world.grid)
+    assert world.undo() and world.undo()
+    assert not world.undo()
+    assert live(world.grid) == start
+    assert world.redo() and world.redo()
+    assert live(world.grid) == edited
+
+
+@pytest.mark.parametrize('kind', ('wireworld', 'life'))
+def test_batch(kind):
+    if kind == 'wireworld':
+        base = workloads.clock_grid(2, 2)
+        contents = [{**base, coord: 1} for coord in list(base)[2:6]]
+    else:
+        contents = [workloads.life_soup(16, seed=seed) for seed in range(4)]
+    runs = batch.WorldBatch(contents, CA_type=kind)
+    runs.run(12)
+    for index, content in enumerate(contents):
+        world = wireworld.World(content=content, CA_type=kind)
+        world.advance(12)
+        assert runs.grid(index) == live(world.grid)
+
+
+def test_recorder(tmp_path):
+    world = wireworld.load_world(os.path.join(root, 'count_9.json'))
+    path = str(tmp_path / 'run')
+    grids = [live(world.grid)]
+    recording = recorder.Recorder(path, world, keyframe_every=7)
+    for _ in range(20):
+        recording.step()
+        grids.append(live(world.grid))
+    recording.close()
+    trajectory = recorder.Trajectory(path)
+    for generation in (0, 6, 7, 13, 20):
+        assert trajectory.seek(generation) == grids[generation]
+    assert live(trajectory.world(13).grid) == grids[13]
+
+
+@pytest.mark.parametrize('kind', ('life', 'random'))
+def test_legacy_step(kind):
+    content = bench_semistable.soup(30)
+    if kind == 'life':
+        make = lambda: wireworld.World(content=content, CA_type='life')
+    else:
+        ca = wireworld.CA(states=3, getrandom=True, seed=4)
+        make = lambda: wireworld.World(content={(x + 100, y + 100): 1 for x, y in content}, CA=ca, CA_type='random')
+    legacy = make()
+    world = make()
+    for _ in range(30):
+        bench_semistable.legacy_step(legacy)
+        world.step()
+        assert legacy.grid == world.grid
+        assert legacy.fingerprint == world.fingerprint
+
+
+def test_cycle():
+    content = workloads.wire_loop(16)
+    world = wireworld.WireWorld(content=content)
+    reference = wireworld.WireWorld(content=content)
+    world.advance(1000)
+    for _ in range(1000):
+        reference.step()
+    assert world.cycle is not None
+    assert live(world.grid) == live(reference.grid)
@@ -1,5 +1,17 @@
+import argparse
+import collections
+import itertools
 import json
+import os
+import sys
+import time
+import weakref
+import numpy as np
 import CA_generator
+import engines
+import golly
+import hashlife
+import parallel
 
 
 # defines the relative points that a cell considers its neighbours
@@ -7,6 +19,10 @@ relative_nbhd = ((-1,-1), (0,-1), (1,-1),
                  (-1, 0),         (1, 0),
                  (-1, 1), (0, 1), (1, 1))
 
+# rules are only compiled into lookup tables for CAs with at most this many states, the size of the table grows as
+# n * 9**(n-1) for n states
+max_table_states = 7
+
 
 def ww_staterule(state, nbhd_state):
     '''
@@ -51,7 +67,7 @@ def life_staterule(state, nbhd_state):
 
 class CA:
     '''Contains the information needed to define a cellular automata.'''
-    def __init__(self, rule=None, mode=None, states=None, getrandom=False, ruledict=None):
+    def __init__(self, rule=None, mode=None, states=None, getrandom=False, ruledict=None, seed=None):
         '''
         Generate the information necessary to generate a cellular automata (CA).
 
@@ -68,6 +84,8 @@ class CA:
             If true, generates a random CA.
         * ruledict(dict):
             May be passed in place of rule. A rule will be constructed from ruledict.
+        * seed(int or None):
+            Seeds the random CA when getrandom is True.
         '''
         if getrandom:
             if states is None:
@@ -76,8 +94,8 @@ class CA:
                 n = states
             else:
                 n = len(states)
-            # Initialise a
-            ca_rules = CA_generator.CA_rules(N_states=n)
+            # Initialise a random set of rules
+            ca_rules = CA_generator.CA_rules(N_states=n, seed=seed)
             self.rule = ca_rules.rules
             self.mode = 'semistable'
             self.states = set(range(n))
@@ -100,6 +118,32 @@ class CA:
             else:
                 self.states = states
             self.ruledict = None
+        self.ruletable = self.compile_rule()
+
+    def compile_rule(self):
+        '''
+        Returns the rule as a flat lookup table.
+
+        The next state of a cell is at state * 9**(n-1) + sum(permutation[s] * 9**(n-1-s)) for n states, where
+        permutation counts the neighbours in each state. The number of neighbours in state 0 is implied by the others
+        so it does not contribute. A ruledict is copied straight into the table, a rule function is called once for every state and every
+        neighbourhood generated by CA_generator.permuter. Returns None if the CA has too many states to tabulate.
+        '''
+        if self.states is None or len(self.states) > max_table_states:
+            return None
+        n = len(self.states)
+        stride = 9**(n-1)
+        # the index of every neighbourhood, less the contribution of the state
+        nbhd_index = CA_generator.compositions(n)[:, 1:] @ (9 ** np.arange(n-2, -1, -1, dtype=np.int64))
+        table = np.zeros(n * stride, dtype=np.uint8)
+        for state in range(n):
+            if self.ruledict is not None:
+                next_states = [self.ruledict[(state, permutation)] for permutation in CA_generator.permuter(n)]
+            else:
+                next_states = [self.rule(state, CA_generator.tup_to_dict(permutation))
+                               for permutation in CA_generator.permuter(n)]
+            table[state * stride + nbhd_index] = next_states
+        return table
 
 
 # initialise the relevant CA objects and store them in a dictionary for reference
@@ -109,13 +153,142 @@ life_CA = CA(rule=life_staterule, mode='semistable', states=2)
 CA_dict = {'wireworld': ww_CA,
            'wireworld-slow': ww_CA,
            'life': life_CA}
+# engines which may take over the stepping of a World, selected by name
+engine_dict = {'numpy': engines.DenseEngine,
+               'bitboard': engines.BitboardEngine,
+               'tiled': engines.TiledEngine,
+               'incremental': engines.IncrementalEngine,
+               'parallel': parallel.ParallelEngine,
+               'hashlife': hashlife.HashLifeEngine}
+
+
+def tighten(counts, low, high):
+    '''
+    Returns the bounds low and high moved inwards until each is a key of counts, which should not be empty.
+
+    If the gap is wide compared to the number of keys, the bounds are instead found as the least and greatest key.
+    '''
+    if low in counts and high in counts:
+        return low, high
+    if high - low > 4 * len(counts):
+        return min(counts), max(counts)
+    while low not in counts:
+        low += 1
+    while high not in counts:
+        high -= 1
+    return low, high
+
+
+class Snapshot:
+    '''
+    A point in the history of a World, returned by World.snapshot, which World.restore can return the world to.
+
+    Only the position in the log of changes of the world is stored, along with the generation and the CA.
+    '''
+    __slots__ = ('position', 'generation', 'CA', 'CA_type', 'size', '__weakref__')
+
+    def __init__(self, position, generation, CA, CA_type, size):
+        self.position = position
+        self.generation = generation
+        self.CA = CA
+        self.CA_type = CA_type
+        self.size = size
+
+
+class EditJournal:
+    '''
+    Records the edits made to a World so that they can be undone and redone.
+
+    Each entry holds only the cells an operation changed, as a list of coordinates along with their old and new
+    states packed into bytes. Every cell edited between begin and end, such as by a whole paste, goes into a single
+    entry. Once the entries hold more than max_cells cells, the oldest are forgotten. The World clears the journal
+    whenever its cells change other than by an edit, since the entries would no longer apply.
+    '''
+    def __init__(self, max_cells=1000000):
+        self.max_cells = max_cells
+        self.undo_entries = collections.deque()
+        self.redo_entries = []
+        self.cells = 0  # the number of cells held by all the entries
+        self.depth = 0  # how many operations are in progress
+        self.group = None  # the changes of the operation in progress, mapping coordinates to old and new states
+
+    def begin(self):
+        '''Starts an operation, the edits up to the matching end are undone together.'''
+        if self.depth == 0:
+            self.group = dict()
+        self.depth += 1
+
+    def end(self):
+        '''Ends an operation, adding it as one entry.'''
+        self.depth -= 1
+        if self.depth == 0:
+            group = self.group
+            self.group = None
+            self.add({coord: states for coord, states in group.items() if states[0] != states[1]})
+
+    def record(self, coord, old_state, new_state):
+        '''Records an edit of a single cell, as its own entry unless an operation is in progress.'''
+        if self.group is not None:
+            if coord in self.group:
+                old_state = self.group[coord][0]
+            self.group[coord] = (old_state, new_state)
+        elif old_state != new_state:
+            self.add({coord: (old_state, new_state)})
+
+    def record_block(self, changeset, states):
+        '''Records the edits of many cells, given a changeset of their old states and a dict of their new states.'''
+        if self.group is not None:
+            for coord, old_state in changeset.items():
+                self.record(coord, old_state, states[coord])
+        elif changeset:
+            coords = list(changeset)
+            self.push(coords, bytes(changeset.values()), bytes(states[coord] for coord in coords))
+
+    def add(self, changes):
+        '''Adds an entry for the changes of an operation, given as a dict mapping coordinates to old and new states.'''
+        if changes:
+            self.push(list(changes), bytes(states[0] for states in changes.values()),
+                      bytes(states[1] for states in changes.values()))
+
+    def push(self, coords, old_states, new_states):
+        '''Adds an entry, forgetting anything which could be redone and the oldest entries if there are too many.'''
+        self.undo_entries.append((coords, old_states, new_states))
+        self.cells += len(coords) - sum(len(entry[0]) for entry in self.redo_entries)
+        self.redo_entries = []
+        while self.cells > self.max_cells and self.undo_entries:
+            self.cells -= len(self.undo_entries.popleft()[0])
+
+    def clear(self):
+        '''Forgets every entry.'''
+        if self.undo_entries or self.redo_entries:
+            self.undo_entries = collections.deque()
+            self.redo_entries = []
+            self.cells = 0
+
+    def undo(self):
+        '''Returns the old states of the last entry as a dict, moving it to be redone, or None if there is none.'''
+        if not self.undo_entries:
+            return None
+        entry = self.undo_entries.pop()
+        self.redo_entries.append(entry)
+        return dict(zip(entry[0], entry[1]))
+
+    def redo(self):
+        '''Returns the new states of the last undone entry as a dict, or None if there is none.'''
+        if not self.redo_entries:
+            return None
+        entry = self.redo_entries.pop()
+        self.undo_entries.append(entry)
+        return dict(zip(entry[0], entry[2]))
 
 
 class World:
     '''
     An instance of a particular cellular automata or world.
     '''
-    def __init__(self, size=(7, 7), content=None, CA=None, CA_type='wireworld'):
+    history_size = 10000  # the number of fingerprints remembered while looking for cycles
+    def __init__(self, size=(7, 7), content=None, CA=None, CA_type='wireworld', engine=None, workers=None,
+                 engine_options=None):
 
         '''
         Creates a particular cellular automata.
@@ -136,6 +309,12 @@ class World:
         * CA_type (string):
             A label corresponding to the type of cellular automata to be run.
             May be passed in place of CA.
+        * engine (string or None):
+            The name of an engine in engine_dict to run each step. If None, the grid is stepped directly.
+        * workers (int or None):
+            If given, the world is stepped by the parallel engine with this many worker processes.
+        * engine_options (dict or None):
+            Keyword arguments passed on to the engine, such as max_nodes and eviction for the hashlife engine.
         '''
         self.CA_type = CA_type
         if CA is None:
@@ -146,10 +325,243 @@ class World:
         if content is None:
             self.grid = dict()
         else:
-            # TODO run checks on content, perhaps reformat
             self.grid = content
-        self.changeset = set(self.grid)  # This set keeps track of which cells have changed after each update
+            self.check_content()
+        # This keeps track of which cells have changed after each update, mapping them to their previous states
+        self.changeset = {coord: 0 for coord in self.grid}
         self.copy_section = None  # This keeps track of copied sections
+        self.generation = 0
+        # a Zobrist hash of the grid, the xor of hash((coord, state)) over the live cells masked to 64 bits, kept up
+        # to date from the changeset by record_changes
+        self.fingerprint = 0
+        self.history = dict()  # maps recent fingerprints to the generation they were first seen
+        self.cycle = None  # once the world is found to repeat, this is (transient length, period)
+        # a repeated fingerprint awaiting confirmation, as (live cells, generation, transient length, period)
+        self.cycle_candidate = None
+        self.profiler = None  # set to a profiling.Profiler to record the time and work of each step
+        # while any snapshot is alive, the changes since the oldest one are kept here, one segment per snapshot
+        self.log = None
+        self.log_start = 0  # the position of the first segment in the log
+        self.snapshots = weakref.WeakSet()
+        self.journal = EditJournal()  # edits which may be undone
+        # statistics of the live cells, kept up to date from the changeset by record_changes
+        self.populations = dict()  # maps each state to the number of cells in it, only live states are counted
+        self.column_counts = dict()  # maps each x to the number of live cells with that x, absent if there are none
+        self.row_counts = dict()  # the same for each y
+        self.bounds = None  # a box containing every live cell, tightened by getbounds
+        self.record_changes()
+        if engine_options is None:
+            engine_options = dict()
+        if workers is None:
+            if engine is None and engine_options:
+                raise Exception('engine_options may only be given along with an engine')
+            self.set_engine(engine, **engine_options)
+        elif engine is None or engine == 'parallel':
+            self.set_engine('parallel', workers=workers, **engine_options)
+        else:
+            raise Exception('workers may only be given for the parallel engine')
+
+    def check_content(self):
+        '''Raises an exception if any cell of the grid is in a state which the CA does not have.'''
+        if not self.grid or self.CA.states is None:
+            return
+        states = np.fromiter(self.grid.values(), dtype=np.int64, count=len(self.grid))
+        allowed = np.fromiter(self.CA.states, dtype=np.int64, count=len(self.CA.states))
+        invalid = ~np.isin(states, allowed)
+        if invalid.any():
+            raise Exception('Content contains states which the CA does not have: {}'.format(
+                sorted(set(states[invalid].tolist()))))
+
+    def set_engine(self, engine, **options):
+        '''
+        Chooses the engine used to step the world, None steps the grid directly.
+
+        Any keyword arguments are passed on to the engine.
+        '''
+        if engine is None:
+            self.engine = None
+        else:
+            self.engine = engine_dict[engine](self, **options)
+        self.invalidate()
+
+    def invalidate(self):
+        '''Discards any data derived from the grid, this should be called whenever the grid is edited.'''
+        if self.engine is not None:
+            self.engine.invalidate()
+
+    def record_changes(self, generations=0):
+        '''
+        Updates the fingerprint of the world from the changeset and looks for a repeated state.
+
+        Kwargs:
+
+        * generations (int):
+            The number of generations over which the changes happened. 0 means the grid has been edited, in which
+            case the history of fingerprints is restarted.
+
+        When an engine jumps many generations at once, only the fingerprints at the end of each jump are seen, so the
+        period found may then be a multiple of the true period.
+
+        Since different grids may share a fingerprint, a repeated fingerprint only gives a candidate cycle, and the
+        live cells at that point are kept. It becomes world.cycle once the world reaches a whole number of periods
+        later with exactly the same live cells, and is dropped if the cells differ.
+        '''
+        # masking once at the end gives the same result as masking each hash, since xor works bit by bit
+        fingerprint = self.fingerprint
+        changeset = self.changeset
+        count = len(changeset)
+        new_states = list(map(self.grid.get, changeset, itertools.repeat(0, count)))
+        for (coord, state), new_state in zip(changeset.items(), new_states):
+            if state != new_state:
+                if state != 0:
+                    fingerprint ^= hash((coord, state))
+                if new_state != 0:
+                    fingerprint ^= hash((coord, new_state))
+        if count:
+            old = np.fromiter(changeset.values(), dtype=np.int64, count=count)
+            new = np.array(new_states, dtype=np.int64)
+            # cells whose state did not change are counted on both sides and cancel out
+            populations = self.populations
+            n_states = int(max(old.max(), new.max())) + 1
+            differences = np.bincount(new, minlength=n_states) - np.bincount(old, minlength=n_states)
+            for state in np.flatnonzero(differences[1:]).tolist():
+                populations[state + 1] = populations.get(state + 1, 0) + int(differences[state + 1])
+            moved = (old == 0) != (new == 0)
+            if moved.any():
+                coords = np.fromiter(itertools.chain.from_iterable(changeset), dtype=np.int64, count=2 * count)
+                self.count_occupancy(coords.reshape(count, 2)[moved], new[moved] != 0)
+        fingerprint &= 0xFFFFFFFFFFFFFFFF
+        self.fingerprint = fingerprint
+        if self.log is not None:
+            if self.snapshots:
+                segment = self.log[-1]
+                for coord, state in changeset.items():
+                    segment.setdefault(coord, state)
+            else:
+                self.log = None
+        if generations == 0:
+            self.history = dict()
+            self.cycle = None
+            self.cycle_candidate = None
+        else:
+            self.journal.clear()  # edits made before the world evolved can no longer be undone
+        self.generation += generations
+        candidate = self.cycle_candidate
+        if candidate is not None and (self.generation - candidate[1]) % candidate[3] == 0:
+            self.cycle_candidate = None
+            if candidate[0] == self.live_cells():
+                self.cycle = candidate[2:]
+        if self.cycle is None:
+            first_seen = self.history.get(fingerprint)
+            if first_seen is not None:
+                if self.cycle_candidate is None:
+                    self.cycle_candidate = (self.live_cells(), self.generation, first_seen,
+                                            self.generation - first_seen)
+            else:
+                self.history[fingerprint] = self.generation
+                if len(self.history) > self.history_size:
+                    del self.history[next(iter(self.history))]
+
+    def live_cells(self):
+        '''Returns a copy of the grid without any cells in state 0.'''
+        return {coord: state for coord, state in self.grid.items() if state != 0}
+
+    def count_occupancy(self, coords, born):
+        '''
+        Updates the number of live cells in each row and column, and the bounds, from the cells born and died.
+
+        Args:
+
+        * coords (array):
+            The coordinates of the cells which were born or died, as an array of shape (n, 2).
+        * born (array):
+            True for the cells which were born and False for those which died.
+
+        The changes are summed for each distinct row and column with numpy, so the dicts are only touched once for
+        each row or column.
+        '''
+        if born.any():
+            xs = coords[born, 0]
+            ys = coords[born, 1]
+            x_min, x_max, y_min, y_max = int(xs.min()), int(xs.max()), int(ys.min()), int(ys.max())
+            if self.bounds is not None:
+                (x_low, x_high), (y_low, y_high) = self.bounds
+                x_min, x_max, y_min, y_max = min(x_min, x_low), max(x_max, x_high), min(y_min, y_low), max(y_max, y_high)
+            self.bounds = ((x_min, x_max), (y_min, y_max))
+        signs = np.where(born, 1, -1)
+        for counts, values in ((self.column_counts, coords[:, 0]), (self.row_counts, coords[:, 1])):
+            keys, inverse = np.unique(values, return_inverse=True)
+            deltas = np.bincount(inverse.ravel(), weights=signs, minlength=len(keys)).astype(np.int64)
+            for key, delta in zip(keys.tolist(), deltas.tolist()):
+                if delta:
+                    total = counts.get(key, 0) + delta
+                    if total:
+                        counts[key] = total
+                    else:
+                        del counts[key]
+        if not self.column_counts:
+            self.bounds = None
+
+    def snapshot(self):
+        '''
+        Returns a Snapshot which the world can later be restored to.
+
+        This takes O(1) time, nothing is copied. Instead, from then on the changeset of every update is merged into
+        a segment of the log, which keeps the state each changed cell had when the segment was started. A new
+        segment is started for each snapshot and the log is trimmed as snapshots are discarded, so keeping several
+        snapshots costs memory in proportion to the number of cells changed since the oldest of them, however many
+        steps have been run.
+        '''
+        if self.log is None:
+            self.log = []
+            self.log_start = 0
+        self.trim_log()
+        if not self.log or self.log[-1]:
+            self.log.append(dict())
+        snapshot = Snapshot(self.log_start + len(self.log) - 1, self.generation, self.CA, self.CA_type, self.size)
+        self.snapshots.add(snapshot)
+        return snapshot
+
+    def trim_log(self):
+        '''Drops the segments logged before the oldest snapshot which is still alive.'''
+        if not self.snapshots:
+            self.log_start += len(self.log)
+            self.log = []
+            return
+        oldest = min(snapshot.position for snapshot in self.snapshots)
+        del self.log[:oldest - self.log_start]
+        self.log_start = oldest
+
+    def restore(self, snapshot):
+        '''
+        Returns the world to the state it was in when a snapshot was taken.
+
+        The logged segments are undone from the newest back to the snapshot, taking time in proportion to the
+        number of cells changed since it was taken. The restore is itself logged as a change, so every other snapshot of the
+        world may still be restored afterwards.
+        '''
+        if snapshot not in self.snapshots:
+            raise Exception('The snapshot was not taken of this world')
+        self.trim_log()
+        keep_dead = self.CA.mode != 'stable' and self.CA.mode != 'semistable'
+        grid = self.grid
+        changes = dict()
+        for segment in reversed(self.log[snapshot.position - self.log_start:]):
+            for coord, state in segment.items():
+                if coord not in changes:
+                    changes[coord] = grid.get(coord, 0)
+                if state != 0 or keep_dead:
+                    grid[coord] = state
+                else:
+                    grid.pop(coord, None)
+        self.CA = snapshot.CA
+        self.CA_type = snapshot.CA_type
+        self.size = snapshot.size
+        self.changeset = {coord: state for coord, state in changes.items() if grid.get(coord, 0) != state}
+        self.generation = snapshot.generation
+        self.journal.clear()
+        self.record_changes()
+        self.invalidate()
 
     def printself(self):
         '''prints a representation of the current state in the console.'''
@@ -179,6 +591,7 @@ class World:
         * value (int or None):
             sets the new state of the cell. If None, state is decremented
         '''
+        start_state = self.getcoordstate(coord)
         if value is None:
             if cycle:
                 state = self.grid.setdefault(coord, 0)
@@ -192,7 +605,100 @@ class World:
             self.grid.pop(coord)
         else:
             self.grid[coord] = state
-        self.changeset = set(coord)
+        self.changeset = {coord: start_state}
+        self.journal.record(coord, start_state, state)
+        self.record_changes()
+        self.invalidate()
+
+    def set_states(self, states, journal=True):
+        '''
+        Sets the states of many cells at once, given as a dict mapping coordinates to states.
+
+        The cells are written in one pass, giving a single changeset, and if journal is True they are recorded as one
+        entry of the journal.
+        '''
+        keep_dead = self.CA.mode != 'stable' and self.CA.mode != 'semistable'
+        grid = self.grid
+        changeset = dict()
+        for coord, state in states.items():
+            old_state = grid.get(coord, 0)
+            if old_state != state:
+                changeset[coord] = old_state
+            if state != 0 or keep_dead:
+                grid[coord] = state
+            else:
+                grid.pop(coord, None)
+        if journal:
+            self.journal.record_block(changeset, states)
+        self.changeset = changeset
+        self.record_changes()
+        self.invalidate()
+
+    def get_region(self, first_coord, second_coord, mask=True):
+        '''
+        Returns the states of the rectangle between two coordinates as a 2D array, states[y][x], and a mask which is
+        True for the cells in the grid. With mask=False only the states are returned, for callers that only draw them.
+
+        Either every coordinate in the rectangle is looked up in the grid, or every cell in the grid is checked
+        against the rectangle, whichever is fewer.
+        '''
+        (x_min, x_max), (y_min, y_max) = region_bounds(first_coord, second_coord)
+        shape = (y_max - y_min + 1, x_max - x_min + 1)
+        grid = self.grid
+        missing = -1 if mask else 0
+        if shape[0] * shape[1] <= len(grid):
+            values = np.array([grid.get((x, y), missing) for y in range(y_min, y_max + 1)
+                               for x in range(x_min, x_max + 1)], dtype=np.int64).reshape(shape)
+        else:
+            values = np.full(shape, missing, dtype=np.int64)
+            for (x, y), state in grid.items():
+                if x_min <= x <= x_max and y_min <= y <= y_max:
+                    values[y - y_min, x - x_min] = state
+        if not mask:
+            return values.astype(np.uint8)
+        in_grid = values >= 0
+        return np.where(in_grid, values, 0).astype(np.uint8), in_grid
+
+    def write_region(self, top_left, states, mask=None):
+        '''
+        Writes a 2D array of states, states[y][x], into the grid with its top left cell at the given coordinate.
+
+        Where a mask is given, only the cells where it is True are written. The whole block is one changeset and one
+        entry of the journal. States are wrapped to be valid, as by editpoint.
+        '''
+        states = np.asarray(states, dtype=np.int64) % (max(self.CA.states) + 1)
+        if mask is None:
+            ys, xs = np.indices(states.shape).reshape(2, -1)
+        else:
+            ys, xs = np.nonzero(mask)
+        coords = zip((xs + top_left[0]).tolist(), (ys + top_left[1]).tolist())
+        self.set_states(dict(zip(coords, states[ys, xs].tolist())))
+
+    def clear_region(self, first_coord, second_coord):
+        '''Sets every cell in the rectangle between two coordinates to 0, as one changeset and journal entry.'''
+        (x_min, x_max), (y_min, y_max) = region_bounds(first_coord, second_coord)
+        grid = self.grid
+        if (x_max - x_min + 1) * (y_max - y_min + 1) <= len(grid):
+            coords = [(x, y) for y in range(y_min, y_max + 1) for x in range(x_min, x_max + 1) if (x, y) in grid]
+        else:
+            coords = [(x, y) for x, y in grid if x_min <= x <= x_max and y_min <= y <= y_max]
+        self.set_states(dict.fromkeys(coords, 0))
+
+    def undo(self):
+        '''Undoes the last edit, or the last paste or erase as a whole. Returns False if there was nothing to undo.'''
+        states = self.journal.undo()
+        if states is None:
+            return False
+        self.set_states(states, journal=False)
+        return True
+
+    def redo(self):
+        '''Redoes the last undone edit. Returns False if there was nothing to redo.'''
+        states = self.journal.redo()
+        if states is None:
+            return False
+        self.set_states(states, journal=False)
+        return True
 
     def getneighbourcoords(self, coord):
         '''Returns the coordinates neighbouring a given point.'''
@@ -211,23 +717,74 @@ class World:
             dict
         '''
         state_dict = {state: 0 for state in self.CA.states}
-        for neighbour in self.getneighbourcoords(coord):
-            state = self.getcoordstate(neighbour)
-            state_dict[state] += 1
+        grid = self.grid
+        x, y = coord
+        for dx, dy in relative_nbhd:
+            state_dict[grid.get((x + dx, y + dy), 0)] += 1
         return state_dict
 
-    def pad(self):
-        '''Adds all cells adjacent to existing cells.'''
-        for coord in self.grid.copy():
-            for x, y in relative_nbhd:
-                neighbour = (coord[0] + x, coord[1] + y)
-                self.grid.setdefault(neighbour, 0)
+    def frontier(self):
+        '''
+        Returns the cells which may be live after the next step of a semistable CA.
+
+        These are the live cells and the cells adjacent to them. Unlike pad, the grid itself is left untouched. This is
+        only used for CAs with too many states to have a compiled rule table, see neighbour_indices.
+        '''
+        candidates = set()
+        for coord, state in self.grid.items():
+            if state != 0:
+                candidates.add(coord)
+                candidates.update((coord[0] + x, coord[1] + y) for x, y in relative_nbhd)
+        return candidates
+
+    def neighbour_indices(self):
+        '''
+        Returns the cells which may be live after the next step of a semistable CA, along with an array of the
+        contribution of their neighbourhoods to their index in the compiled rule table.
 
-    def trim(self):
-        '''Removes all cells containing zeroes.'''
-        for coord, state in self.grid.copy().items():
-            if state == 0 or (self.CA_type == 'random' and (max(coord) > 120 or min(coord) < -120)):
-                del self.grid[coord]
+        A neighbour in state s contributes 9**(n-1-s) for n states. The neighbours of the live cells in each state are
+        counted into a single Counter, so every cell next to a live cell gets one entry, and live cells with no live
+        neighbours are added after them with a contribution of 0.
+        '''
+        n = len(self.CA.states)
+        cells = collections.defaultdict(list)
+        for coord, state in self.grid.items():
+            if state != 0:
+                cells[state].append(coord)
+        index = collections.Counter()
+        for state, coords in cells.items():
+            weight = 9**(n-1-state)
+            neighbours = ((x + dx, y + dy) for x, y in coords for dx, dy in relative_nbhd)
+            if weight == 1:
+                index.update(neighbours)  # counted in C
+            else:
+                for coord in neighbours:
+                    index[coord] += weight
+        candidates = list(index)
+        contributions = list(index.values())
+        for coords in cells.values():
+            isolated = [coord for coord in coords if coord not in index]
+            candidates.extend(isolated)
+            contributions.extend(itertools.repeat(0, len(isolated)))
+        return candidates, np.array(contributions, dtype=np.int64)
+
+    def table_step(self, candidates, contributions):
+        '''
+        Sets the grid and changeset for the next step of a semistable CA from the compiled rule table, given the
+        candidate cells and neighbourhood contributions found by neighbour_indices.
+        '''
+        grid = self.grid
+        count = len(candidates)
+        states = np.fromiter(map(grid.get, candidates, itertools.repeat(0, count)), dtype=np.int64, count=count)
+        stride = 9**(len(self.CA.states) - 1)
+        new_states = self.CA.ruletable[states * stride + contributions]
+        if self.CA_type == 'random':
+            far = np.fromiter((max(coord) > 120 or min(coord) < -120 for coord in candidates), dtype=bool, count=count)
+            new_states[far] = 0
+        changed = np.flatnonzero(states != new_states).tolist()
+        self.changeset = dict(zip([candidates[i] for i in changed], states[changed].tolist()))
+        live = np.flatnonzero(new_states).tolist()
+        self.grid = dict(zip([candidates[i] for i in live], new_states[live].tolist()))
 
     def getcoordstate(self, coord):
         '''
@@ -243,40 +800,116 @@ class World:
 
     def step(self):
         '''Runs one step of the cellular automata.'''
-        new_states = dict()
-        if self.CA.mode == 'semistable':
-            self.pad()
-        self.changeset = set()
-        for coord, state in self.grid.items():
-            nbhd_state = self.getneighbours(coord)
-            new_state = self.CA.rule(state, nbhd_state)
-            new_states[coord] = new_state
-            if state != new_state:
-                self.changeset.add(coord)
-        self.grid = new_states
-        if self.CA.mode == 'stable' or self.CA.mode == 'semistable':
-            self.trim()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_step()
+        if self.engine is not None:
+            self.engine.step(self)
+            if profiler is not None:
+                profiler.mark('engine')
+        elif self.CA.mode == 'semistable' and self.CA.ruletable is not None:
+            candidates, contributions = self.neighbour_indices()
+            if profiler is not None:
+                profiler.mark('frontier')
+                profiler.count('cells_examined', len(candidates))
+                profiler.count('rule_calls', len(candidates))
+            self.table_step(candidates, contributions)
+            if profiler is not None:
+                profiler.mark('rules')
+        else:
+            if self.CA.mode == 'semistable':
+                candidates = self.frontier()
+            else:
+                candidates = self.grid
+            if profiler is not None:
+                profiler.mark('frontier')
+                profiler.count('cells_examined', len(candidates))
+                profiler.count('rule_calls', len(candidates))
+            drop_zeros = self.CA.mode == 'stable' or self.CA.mode == 'semistable'
+            cutoff = self.CA_type == 'random'
+            grid = self.grid
+            new_states = dict()
+            self.changeset = dict()
+            for coord in candidates:
+                state = grid.get(coord, 0)
+                nbhd_state = self.getneighbours(coord)
+                new_state = self.CA.rule(state, nbhd_state)
+                if drop_zeros and cutoff and (max(coord) > 120 or min(coord) < -120):
+                    new_state = 0
+                if state != new_state:
+                    self.changeset[coord] = state
+                if new_state != 0 or not drop_zeros:
+                    new_states[coord] = new_state
+            self.grid = new_states
+            if profiler is not None:
+                profiler.mark('rules')
+        self.record_changes(generations=1)
+        if profiler is not None:
+            profiler.mark('record')
+            profiler.end_step(self)
+
+    def advance(self, n):
+        '''
+        Runs n steps of the cellular automata.
+
+        If the engine is able to, it will jump ahead rather than running each step in turn. Once the world has
+        been found to repeat, whole cycles are skipped. The changeset then contains every cell which differs from
+        its state n steps earlier.
+        '''
+        changes = dict()
+        while n > 0:
+            if self.cycle is not None:
+                skipped = n - n % self.cycle[1]
+                self.generation += skipped
+                n -= skipped
+                if n == 0:
+                    break
+            if self.engine is not None and hasattr(self.engine, 'advance'):
+                profiler = self.profiler
+                if profiler is not None:
+                    profiler.begin_step()
+                self.engine.advance(self, n)
+                if profiler is not None:
+                    profiler.mark('engine')
+                self.record_changes(generations=n)
+                if profiler is not None:
+                    profiler.mark('record')
+                    profiler.end_step(self, generations=n)
+                n = 0
+            else:
+                self.step()
+                n -= 1
+            for coord, state in self.changeset.items():
+                changes.setdefault(coord, state)
+        self.changeset = {coord: state for coord, state in changes.items() if self.getcoordstate(coord) != state}
 
     def getbounds(self):
-        '''Returns the bounds for the position of the active cells.'''
-        if not bool(self.grid):
+        '''
+        Returns the bounds for the position of the live cells, or None if there are none.
+
+        The bounds are kept up to date as cells are born, and when cells die the edges are moved inwards past any
+        rows and columns left empty, so this takes O(1) time unless the live cells have shrunk away from an edge.
+        '''
+        if self.bounds is None:
             return None
-        x_max = max(x for x, y in self.grid)  # note: x,y is the coordinate, not the key value pair
-        x_min = min(x for x, y in self.grid)
-        y_max = max(y for x, y in self.grid)
-        y_min = min(y for x, y in self.grid)
-        return (x_min, x_max), (y_min, y_max)
+        (x_min, x_max), (y_min, y_max) = self.bounds
+        self.bounds = tighten(self.column_counts, x_min, x_max), tighten(self.row_counts, y_min, y_max)
+        return self.bounds
 
     def livecellcount(self):
         '''Returns the number of live cells.'''
-        return len(self.grid)
+        return sum(self.populations.values())
 
     def becomerandom(self, N=3):
         '''Exchange current CA with a randomly generated one.'''
         self.CA = CA(states=N, getrandom=True)
         self.CA_type = 'random'
+        self.changeset = {coord: state for coord, state in self.grid.items() if state % N != state}
         for coord, state in self.grid.items():
             self.grid[coord] = state % N
+        self.journal.clear()
+        self.record_changes()
+        self.invalidate()
 
     def save_copy(self, first_coord, second_coord):
         '''Save the data within the selected region'''
@@ -286,30 +919,34 @@ class World:
         '''Paste the copied section from the selected point'''
         if self.copy_section is not None:
             top_left = (origin[0] + self.copy_section.offset[0], origin[1] + self.copy_section.offset[1])
-            for dy, row in enumerate(self.copy_section.state_array):
-                for dx, state in enumerate(row):
-                    coord = (top_left[0] + dx, top_left[1] + dy)
-                    self.editpoint(coord, value=state, cycle=False)
+            self.write_region(top_left, self.copy_section.state_array)
 
     def erase_section(self, first_coord, second_coord):
         '''Erase all points within the chosen section'''
-        top_left = (min(first_coord[0], second_coord[0]), min(first_coord[1], second_coord[1]))
-        bottom_right = (max(first_coord[0], second_coord[0]), max(first_coord[1], second_coord[1]))
-        for x in range(top_left[0], bottom_right[0] + 1):
-            for y in range(top_left[1], bottom_right[1] + 1):
-                coord = (x, y)
-                self.editpoint(coord, value=0)
+        self.clear_region(first_coord, second_coord)
 
     def clear(self):
         '''Removes all live cells.'''
+        self.journal.begin()
+        for coord, state in self.grid.items():
+            self.journal.record(coord, state, 0)
+        self.journal.end()
+        self.changeset = self.grid
         self.grid = dict()
+        self.record_changes()
+        self.invalidate()
 
 
 class CopySection:
-    '''Keeps track of copied sections'''
+    '''
+    Keeps track of copied sections
+
+    The states of the section are held as a 2D array, state_array[y][x], along with a mask which is True for the
+    cells which were in the grid when the section was copied.
+    '''
     def __init__(self, world, first_coord, second_coord):
         '''Create a copy of the world coordinates between the specified coordinates.'''
-        self.state_array = self.calculate_state_array(world, first_coord, second_coord)
+        self.state_array, self.mask = self.calculate_state_array(world, first_coord, second_coord)
         self.offset = self.calculate_offset(first_coord, second_coord)
         # self.max_states is not currently used, it was designed for the case where a section is pasted into a world
         # which allows fewer states with a view that it would give an appropriate warning.
@@ -317,26 +954,8 @@ class CopySection:
         self.max_states = self.calculate_max_states()
 
     def calculate_state_array(self, world, first_coord, second_coord):
-        '''Returns an array containing all the states within the specified coordinates.'''
-        coord_array = self.calculate_coord_array(first_coord, second_coord)
-        state_array = []
-        for coord_row in coord_array:
-            state_row = []
-            for coord in coord_row:
-                if coord in world.grid:
-                    state = world.grid[coord]
-                else:
-                    state = None
-                state_row.append(state)
-            state_array.append(state_row)
-        return state_array
-
-    def calculate_coord_array(self, first_coord, second_coord):
-        '''Returns an array containing all the coordinates within the specified coordinates.'''
-        top_left = (min(first_coord[0], second_coord[0]), min(first_coord[1], second_coord[1]))
-        bottom_right = (max(first_coord[0], second_coord[0]), max(first_coord[1], second_coord[1]))
-        array = [[(x, y) for x in range(top_left[0], bottom_right[0]+1)] for y in range(top_left[1], bottom_right[1]+1)]
-        return array
+        '''Returns an array of all the states within the specified coordinates, and a mask of the cells in the grid.'''
+        return world.get_region(first_coord, second_coord)
 
     def calculate_offset(self, first_coord, second_coord):
         '''Returns the difference between the top left coord of the state_array and the first specified coord.'''
@@ -350,10 +969,80 @@ class CopySection:
 
         Thsi may be useful if pasting to a different CA.
         '''
-        def none_to_zero(row):
-            return [0 if x is None else x for x in row]
-        max_state = max([max(none_to_zero(row)) for row in self.state_array])
-        return max_state
+        return int(self.state_array.max())
+
+
+def region_bounds(first_coord, second_coord):
+    '''Returns the bounds of the rectangle with two coordinates as opposite corners, in the form of World.getbounds.'''
+    x_bounds = (min(first_coord[0], second_coord[0]), max(first_coord[0], second_coord[0]))
+    y_bounds = (min(first_coord[1], second_coord[1]), max(first_coord[1], second_coord[1]))
+    return x_bounds, y_bounds
+
+
+class ConductorGraph:
+    '''
+    The adjacency of the cells of a wireworld, stored in compressed sparse row form.
+
+    Every cell in the grid is given an integer id, the ids neighbouring the cell with id i are
+    indices[indptr[i]:indptr[i+1]]. Since live wireworld cells never die, the graph stays valid until the grid is
+    edited.
+    '''
+    def __init__(self, grid, rule):
+        '''
+        Builds the graph for the cells of a grid.
+
+        Args:
+
+        * grid (dict):
+            The grid of a WireWorld.
+        * rule (function):
+            The wireworld rule, used to decide how many electron heads will excite a conductor.
+        '''
+        self.coords = list(grid)
+        ids = {coord: i for i, coord in enumerate(self.coords)}
+        self.states = np.fromiter(grid.values(), dtype=np.uint8, count=len(self.coords))
+        indptr = [0]
+        indices = []
+        for x, y in self.coords:
+            for dx, dy in relative_nbhd:
+                neighbour = ids.get((x + dx, y + dy))
+                if neighbour is not None:
+                    indices.append(neighbour)
+            indptr.append(len(indices))
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.heads = np.flatnonzero(self.states == 1)
+        self.tails = np.flatnonzero(self.states == 2)
+        # whether a conductor with a given number of electron head neighbours becomes an electron head
+        self.excited = np.array([rule(3, {0: 8 - n, 1: n, 2: 0, 3: 0}) == 1 for n in range(9)])
+        self.examined = 0  # the number of cells the last step looked at
+
+    def neighbours(self, ids):
+        '''Returns the ids neighbouring each of the given ids, repeated once for each of them.'''
+        starts = self.indptr[ids]
+        lengths = self.indptr[ids + 1] - starts
+        ends = np.cumsum(lengths)
+        positions = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+        return self.indices[positions]
+
+    def step(self):
+        '''
+        Runs one step of wireworld on the graph.
+
+        Returns:
+            The ids of the new electron heads, the new electron tails and the new conductors.
+        '''
+        candidates, head_counts = np.unique(self.neighbours(self.heads), return_counts=True)
+        self.examined = len(candidates)
+        new_heads = candidates[(self.states[candidates] == 3) & self.excited[head_counts]]
+        new_tails = self.heads
+        new_conductors = self.tails
+        self.states[new_conductors] = 3
+        self.states[new_tails] = 2
+        self.states[new_heads] = 1
+        self.heads = new_heads
+        self.tails = new_tails
+        return new_heads, new_tails, new_conductors
 
 
 class WireWorld(World):
@@ -362,11 +1051,14 @@ class WireWorld(World):
 
     Performance is improved by only checking for updates near red (state 1) cells.
     If there are many state (3) cells, these will not be checked while updating.
+    The neighbours of each cell are found from a ConductorGraph, which is only rebuilt after the grid is edited.
     '''
-    def __init__(self, size=(7, 7), content=None):
-        super().__init__(size=size, content=content, CA_type='wireworld')
+    def __init__(self, size=(7, 7), content=None, engine=None, workers=None, engine_options=None):
+        super().__init__(size=size, content=content, CA_type='wireworld', engine=engine, workers=workers,
+                         engine_options=engine_options)
         self.red_cells = self.get_state_cells(1)
         self.blue_cells = self.get_state_cells(2)
+        self.graph = None
 
     def get_state_cells(self, target_state):
         '''Returns a set of all cells in the target state.'''
@@ -376,39 +1068,71 @@ class WireWorld(World):
                 state_cells.add(coord)
         return state_cells
 
+    def track_state_cells(self):
+        '''Updates the red and blue cells from the changeset.'''
+        for coord in self.changeset:
+            state = self.getcoordstate(coord)
+            self.red_cells.discard(coord)
+            self.blue_cells.discard(coord)
+            if state == 1:
+                self.red_cells.add(coord)
+            elif state == 2:
+                self.blue_cells.add(coord)
+
+    def advance(self, n):
+        '''Runs n steps of the cellular automata while keeping track of red and blue cells.'''
+        super().advance(n)
+        if self.engine is not None:
+            self.track_state_cells()
+
+    def invalidate(self):
+        '''Discards the conductor graph along with any other data derived from the grid.'''
+        super().invalidate()
+        self.graph = None
+
     def step(self):
         '''
         Applies one iteration of the cellular automata rule
 
-        If the automata is wireworld, an improved algorithm is applied.
+        If the automata is wireworld, an improved algorithm is applied unless an engine has been chosen.
         '''
         if self.CA_type != 'wireworld':
             super().step()
+        elif self.engine is not None:
+            super().step()
+            self.track_state_cells()
         else:
-            self.changeset = set()
-            important_cells = set()
-            new_reds = set()
-            for coord in self.red_cells:
-                for neighbour in self.getneighbourcoords(coord):
-                    if self.getcoordstate(neighbour) == 3:
-                        important_cells.add(neighbour)
-            for coord in important_cells:
-                state = 3
-                nbhd_state = self.getneighbours(coord)
-                new_state = self.CA.rule(state, nbhd_state)
-                if new_state == 1:
-                    new_reds.add(coord)
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.begin_step()
+            if self.graph is None:
+                self.graph = ConductorGraph(self.grid, self.CA.rule)
+            if profiler is not None:
+                profiler.mark('graph')
+            coords = self.graph.coords
+            new_heads, new_tails, new_conductors = self.graph.step()
+            if profiler is not None:
+                profiler.mark('rules')
+                profiler.count('cells_examined', self.graph.examined)
+                profiler.count('rule_calls', self.graph.examined)
+            new_reds = {coords[i] for i in new_heads.tolist()}
             for coord in new_reds:
                 self.grid[coord] = 1
-                self.changeset.add(coord)
             for coord in self.red_cells:
                 self.grid[coord] = 2
-                self.changeset.add(coord)
             for coord in self.blue_cells:
                 self.grid[coord] = 3
-                self.changeset.add(coord)
+            self.changeset = dict.fromkeys(new_reds, 3)
+            self.changeset.update(dict.fromkeys(self.red_cells, 1))
+            self.changeset.update(dict.fromkeys(self.blue_cells, 2))
             self.blue_cells = self.red_cells
             self.red_cells = new_reds
+            if profiler is not None:
+                profiler.mark('changeset')
+            self.record_changes(generations=1)
+            if profiler is not None:
+                profiler.mark('record')
+                profiler.end_step(self)
 
     def editpoint(self, coord, value=None, cycle=True):
         '''Edits a specified point while keeping track of red and blue cells.'''
@@ -425,6 +1149,19 @@ class WireWorld(World):
         elif next_value == 2:
             self.blue_cells.add(coord)
 
+    def restore(self, snapshot):
+        '''Restores a snapshot while keeping track of red and blue cells.'''
+        super().restore(snapshot)
+        self.track_state_cells()
+
+    def set_states(self, states, journal=True):
+        '''Sets the states of many cells at once while keeping track of red and blue cells.'''
+        super().set_states(states, journal=journal)
+        self.red_cells.difference_update(states)
+        self.blue_cells.difference_update(states)
+        self.red_cells.update(coord for coord, state in states.items() if state == 1)
+        self.blue_cells.update(coord for coord, state in states.items() if state == 2)
+
     def clear(self):
         '''Removes all live cells.'''
         super().clear()
@@ -435,47 +1172,166 @@ class WireWorld(World):
 
 
 
-#TODO add these as mothods for World
-def load_world(infile):
-    '''Loads Json file into a World object.'''
+def parse_keys(keys, length):
+    '''
+    Returns string keys of tuples of ints, such as "(3, -4)" or "(0, (8, 0, 0, 0))", as an array with one row per key.
+
+    The keys are joined and read as a single list of numbers rather than being evaluated one at a time. Each key is
+    first checked to be bracketed and to hold exactly length numbers, since otherwise numbers could shift from one key
+    to the next.
+    '''
+    if not keys:
+        return np.zeros((0, length), dtype=np.int64)
+    commas = np.fromiter(map(str.count, keys, itertools.repeat(',')), dtype=np.int64, count=len(keys))
+    opened = np.fromiter(map(str.startswith, keys, itertools.repeat('(')), dtype=bool, count=len(keys))
+    closed = np.fromiter(map(str.endswith, keys, itertools.repeat(')')), dtype=bool, count=len(keys))
+    malformed = np.flatnonzero((commas != length - 1) | ~opened | ~closed)
+    if malformed.size:
+        raise Exception('Keys must each be a tuple of {} ints, not {}'.format(length, keys[malformed[0]]))
+    text = ','.join(keys).replace('(', '').replace(')', '')
+    try:
+        values = np.fromstring(text, dtype=np.int64, sep=',')
+    except ValueError:
+        values = None
+    if values is None or values.size != len(keys) * length:
+        raise Exception('Keys must each be a tuple of {} ints'.format(length))
+    return values.reshape(len(keys), length)
+
+
+def json_state(world_data):
+    '''
+    Returns the cells of a world loaded from json as a grid.
+
+    The cells may be given in one of three ways. "state" may be a dict whose keys are coordinates written as
+    strings, or a dense list of rows in which state[y][x] is the state of (x, y) and dead cells are left out of the
+    grid. Otherwise "xs", "ys" and "states" are lists giving the cells one by one, as written by save_world.
+    '''
+    if 'xs' in world_data:
+        xs, ys, states = world_data['xs'], world_data['ys'], world_data['states']
+        if not len(xs) == len(ys) == len(states):
+            raise Exception('xs, ys and states must have the same length')
+        return dict(zip(zip(xs, ys), states))
+    state = world_data['state']
+    if type(state) is dict:
+        coords = parse_keys(list(state), 2)
+        return dict(zip(zip(coords[:, 0].tolist(), coords[:, 1].tolist()), state.values()))
+    if type(state) is list:
+        try:
+            array = np.array(state, dtype=np.int64)
+        except ValueError:
+            raise Exception('A list state must be a rectangular list of rows of states')
+        if array.size == 0:
+            return dict()
+        if array.ndim != 2:
+            raise Exception('A list state must be a rectangular list of rows of states')
+        ys, xs = np.nonzero(array)
+        return dict(zip(zip(xs.tolist(), ys.tolist()), array[ys, xs].tolist()))
+    raise Exception('state must be a dict or a list')
+
+
+def json_ruledict(string_ruledict, n_states):
+    '''Returns a ruledict loaded from json, whose keys are strings of the form "(state, permutation)".'''
+    keys = parse_keys(list(string_ruledict), n_states + 1).tolist()
+    return {(key[0], tuple(key[1:])): value for key, value in zip(keys, string_ruledict.values())}
+
+
+def load_world(infile, engine=None, workers=None, engine_options=None):
+    '''
+    Loads a World object from a .json, .npz, .rle or .mc file, optionally choosing the engine it is stepped with.
+
+    The format is chosen by the file extension. Any engine_options are passed on to the engine. The states of the cells are checked against the states of the CA.
+    '''
+    if infile[-4:] == '.npz':
+        return load_npz(infile, engine=engine, workers=workers, engine_options=engine_options)
+    if infile[-4:] == '.rle' or infile[-3:] == '.mc':
+        return load_golly(infile, engine=engine, workers=workers, engine_options=engine_options)
     if infile[-5:] != '.json':
-        raise Exception('File name must end in .json')
+        raise Exception('File name must end in .json, .npz, .rle or .mc')
     with open(infile) as json_file:
         world_data = json.load(json_file)
     CA_type = world_data['CA_type']
     size = tuple(world_data['size'])
-    state = world_data['state']
-    if type(state) is dict:
-        state = {tuple(eval(k)): v for k, v in state.items()}
-    elif type(state) is list:
-        # TODO turn an array into a dict
-        pass
+    state = json_state(world_data)
     if 'ruledict' in world_data:
-        string_ruledict = world_data['ruledict']
-        ruledict = {eval(k): v for k, v in string_ruledict.items()}
         n_states = world_data['Nstates']
+        ruledict = json_ruledict(world_data['ruledict'], n_states)
         mode = world_data['mode']
         ca = CA(mode=mode, states=n_states, ruledict=ruledict)
-        world = World(size=size, content=state, CA=ca, CA_type=CA_type)
+        world = World(size=size, content=state, CA=ca, CA_type=CA_type, engine=engine, workers=workers,
+                      engine_options=engine_options)
     elif CA_type == 'wireworld':
-        world = WireWorld(size=size, content=state)
+        world = WireWorld(size=size, content=state, engine=engine, workers=workers, engine_options=engine_options)
     else:
-        world = World(size=size, content=state, CA_type=CA_type)
+        world = World(size=size, content=state, CA_type=CA_type, engine=engine, workers=workers,
+                      engine_options=engine_options)
     return world
 
 
+def load_npz(infile, engine=None, workers=None, engine_options=None):
+    '''
+    Loads a World object from a .npz file written by save_npz.
+
+    The cells are stored as arrays of x, y and state, and a ruledict as a table of next states whose rows are the
+    current states and whose columns follow CA_generator.compositions, so nothing needs to be parsed.
+    '''
+    with np.load(infile, allow_pickle=False) as world_data:
+        CA_type = str(world_data['CA_type'])
+        size = tuple(world_data['size'].tolist())
+        coords = zip(world_data['xs'].tolist(), world_data['ys'].tolist())
+        state = dict(zip(coords, world_data['states'].tolist()))
+        if 'ruletable' in world_data:
+            ruledict = CA_generator.table_to_dict(world_data['ruletable'])
+            mode = str(world_data['mode'])
+            n_states = int(world_data['Nstates'])
+        else:
+            ruledict = None
+    if ruledict is not None:
+        ca = CA(mode=mode, states=n_states, ruledict=ruledict)
+        world = World(size=size, content=state, CA=ca, CA_type=CA_type, engine=engine, workers=workers,
+                      engine_options=engine_options)
+    elif CA_type == 'wireworld':
+        world = WireWorld(size=size, content=state, engine=engine, workers=workers, engine_options=engine_options)
+    else:
+        world = World(size=size, content=state, CA_type=CA_type, engine=engine, workers=workers,
+                      engine_options=engine_options)
+    return world
+
+
+def load_golly(infile, engine=None, workers=None, engine_options=None):
+    '''
+    Loads a World object from a Golly .rle or .mc file, see golly.
+
+    Only the WireWorld and B3/S23 rules are supported, giving a WireWorld or a World running the game of life.
+    '''
+    if infile[-4:] == '.rle':
+        state, CA_type, size = golly.read_rle(infile)
+    else:
+        state, CA_type, size = golly.read_macrocell(infile)
+    if CA_type == 'wireworld':
+        return WireWorld(size=size, content=state, engine=engine, workers=workers, engine_options=engine_options)
+    return World(size=size, content=state, CA_type=CA_type, engine=engine, workers=workers,
+                 engine_options=engine_options)
+
+
 def save_world(world, outfile, permission='x'):
-    '''Saves World object as Json file.'''
+    '''Saves World object as a .json, .npz, .rle or .mc file, chosen by the file extension.'''
+    if outfile[-4:] == '.npz':
+        save_npz(world, outfile, permission=permission)
+        return
+    if outfile[-4:] == '.rle':
+        golly.write_rle(world.grid, world.CA_type, outfile, permission=permission)
+        return
+    if outfile[-3:] == '.mc':
+        golly.write_macrocell(world.grid, world.CA_type, outfile, permission=permission)
+        return
     if outfile[-5:] != '.json':
-        raise Exception('File name must end in .json')
-    CA_type = world.CA_type
-    size = world.size
-    state = world.grid
-    state = {str(k): v for k, v in state.items()}
+        raise Exception('File name must end in .json, .npz, .rle or .mc')
     ruledict = world.CA.ruledict
-    world_data = {'CA_type': CA_type,
-                  'size': size,
-                  'state': state}
+    world_data = {'CA_type': world.CA_type,
+                  'size': world.size,
+                  'xs': [x for x, y in world.grid],
+                  'ys': [y for x, y in world.grid],
+                  'states': list(world.grid.values())}
     if ruledict is not None:
         string_dict = {str(k): v for k, v in ruledict.items()}
         world_data['ruledict'] = string_dict
@@ -485,6 +1341,27 @@ def save_world(world, outfile, permission='x'):
         json.dump(world_data, json_file)
 
 
+def save_npz(world, outfile, permission='x'):
+    '''Saves World object as a compressed .npz file, see load_npz.'''
+    count = len(world.grid)
+    coords = np.fromiter((value for coord in world.grid for value in coord), dtype=np.int64, count=2*count)
+    world_data = {'CA_type': np.array(world.CA_type),
+                  'size': np.array(world.size, dtype=np.int64),
+                  'xs': coords[0::2],
+                  'ys': coords[1::2],
+                  'states': np.fromiter(world.grid.values(), dtype=np.uint8, count=count)}
+    ruledict = world.CA.ruledict
+    if ruledict is not None:
+        n_states = len(world.CA.states)
+        permutations = list(CA_generator.permuter(n_states))
+        world_data['ruletable'] = np.array([[ruledict[(state, permutation)] for permutation in permutations]
+                                            for state in range(n_states)], dtype=np.uint8)
+        world_data['Nstates'] = np.array(n_states)
+        world_data['mode'] = np.array(world.CA.mode)
+    with open(outfile, permission + 'b') as npz_file:
+        np.savez_compressed(npz_file, **world_data)
+
+
 def example_run():
     # test_dict = {(0,1): 3, (1,0): 3, (1,2): 1, (2,1): 2}
     #
@@ -515,5 +1392,111 @@ def example_run():
     save_world(world, infile_2, permission='x')
 
 
+def peak_memory():
+    '''Returns the peak resident memory of this process in bytes, or None where it cannot be found.'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_headless(world, steps, snapshot_every=None, snapshot_path=None):
+    '''
+    Runs a world without the interface, returning statistics about the run.
+
+    Args:
+
+    * world (World):
+        The world to run.
+    * steps (int):
+        The number of generations to run.
+
+    Kwargs:
+
+    * snapshot_every (int or None):
+        If given, the world is saved each time this many generations have been run.
+    * snapshot_path (string or None):
+        The file name the snapshots are saved to, formatted with the generation, e.g. 'out_{generation:06d}.json'.
+
+    Returns:
+        dict, with the number of generations, the seconds taken and the number of cell updates, which is the sum
+        of the population over every generation run. Engines which jump ahead with advance are run a snapshot at
+        a time, and the population is then taken as the mean of the population before and after.
+    '''
+    jumps = world.engine is not None and hasattr(world.engine, 'advance')
+    chunk = snapshot_every if snapshot_every else steps
+    generations = 0
+    cell_updates = 0
+    seconds = 0.0
+    while generations < steps:
+        n = min(chunk, steps - generations)
+        start = time.perf_counter()
+        if jumps:
+            population = world.livecellcount()
+            world.advance(n)
+            cell_updates += n * (population + world.livecellcount()) // 2
+        else:
+            for _ in range(n):
+                cell_updates += world.livecellcount()
+                world.step()
+        seconds += time.perf_counter() - start
+        generations += n
+        if snapshot_every and generations % snapshot_every == 0:
+            save_world(world, snapshot_path.format(generation=generations), permission='w')
+    return {'generations': generations, 'seconds': seconds, 'cell_updates': cell_updates}
+
+
+def main(argv=None):
+    '''The command line interface, run with python -m wireworld.'''
+    parser = argparse.ArgumentParser(prog='wireworld', description='Runs cellular automata without the interface.')
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help='step a saved world and report the throughput')
+    run_parser.add_argument('infile', help='the world to load')
+    run_parser.add_argument('--steps', type=int, required=True, help='the number of generations to run')
+    run_parser.add_argument('--engine', choices=sorted(engine_dict), default=None,
+                            help='the engine to step the world with, by default the grid is stepped directly')
+    run_parser.add_argument('--workers', type=int, default=None, help='the number of processes for the parallel engine')
+    run_parser.add_argument('--max-nodes', type=int, default=None, metavar='N',
+                            help='the number of quadtree nodes the hashlife engine keeps before collecting, 0 for no limit')
+    run_parser.add_argument('--eviction', choices=('reachable', 'results'), default=None,
+                            help='what the hashlife engine drops once it holds too many nodes')
+    run_parser.add_argument('--snapshot-every', type=int, default=None, metavar='K',
+                            help='save the world every K generations')
+    run_parser.add_argument('--snapshot-dir', default='.', help='the directory snapshots are saved to')
+    run_parser.add_argument('--snapshot-format', choices=('json', 'npz', 'rle', 'mc'), default='json',
+                            help='the file format of the snapshots')
+    run_parser.add_argument('--out', default=None, help='save the final world to this file')
+    subparsers.add_parser('example', help='run the original example')
+    args = parser.parse_args(argv)
+
+    if args.command != 'run':
+        example_run()
+        return
+    engine_options = dict()
+    if args.max_nodes is not None:
+        engine_options['max_nodes'] = args.max_nodes or None
+    if args.eviction is not None:
+        engine_options['eviction'] = args.eviction
+    if engine_options and args.engine != 'hashlife':
+        parser.error('--max-nodes and --eviction only apply to the hashlife engine')
+    world = load_world(args.infile, engine=args.engine, workers=args.workers, engine_options=engine_options)
+    stem = os.path.splitext(os.path.basename(args.infile))[0]
+    snapshot_path = os.path.join(args.snapshot_dir, stem + '_{generation:08d}.' + args.snapshot_format)
+    stats = run_headless(world, args.steps, snapshot_every=args.snapshot_every, snapshot_path=snapshot_path)
+    if args.out is not None:
+        save_world(world, args.out, permission='w')
+    seconds = max(stats['seconds'], 1e-9)
+    peak = peak_memory()
+    print('generations:         {}'.format(stats['generations']))
+    print('seconds:             {:.3f}'.format(stats['seconds']))
+    print('generations/s:       {:.1f}'.format(stats['generations'] / seconds))
+    print('cell updates/s:      {:.0f}'.format(stats['cell_updates'] / seconds))
+    print('final population:    {}'.format(world.livecellcount()))
+    print('peak memory:         {}'.format('unavailable' if peak is None else '{:.1f} MiB'.format(peak / 2**20)))
+
+
 if __name__ == "__main__":
-    example_run()
+    main()
@@ -1,6 +1,7 @@
-import copy
 import tkinter as tk
 from tkinter import messagebox
+import numpy as np
+import profiling
 import wireworld as ww
 
 
@@ -9,11 +10,13 @@ import wireworld as ww
 colordict = {0: 'white', 1: 'red', 2: 'blue', 3: 'yellow'}
 nightdict = {0: 'black', 1: 'red', 2: 'blue', 3: 'yellow'}
 oob_color = 'red'
+grid_line_color = 'gray'  # drawn between cells which are at least 4 pixels across
+tile_size = 16  # the number of cells across each square of the display redrawn after a step
 
 
 class Grid(tk.Frame):
     '''The frame containing the wireworld GUI.'''
-    def __init__(self, world, master=None, size=None):
+    def __init__(self, world, master=None, size=None, cell_size=16):
         '''
         Generate all the main tkinter widgets.
 
@@ -28,6 +31,8 @@ class Grid(tk.Frame):
             The parent of the Grid.
         * size(tuple):
             Describes the size of the initial display.
+        * cell_size(int):
+            The number of pixels across each cell of the display.
         '''
         super().__init__(master)
         self.pack()  # place self inside master
@@ -62,6 +67,11 @@ class Grid(tk.Frame):
 
         self.palette = colordict
 
+        # the cells are drawn as a single image on a canvas, which is hidden while zoomed out
+        self.cells = CellCanvas(self.grid_frame, size=self.size, cell_size=cell_size, palette=self.palette)
+        self.cells.bind('<Button-1>', self.click)
+        self.marks = dict()  # the bitmaps marking the selected cells, by world coordinate
+
         # create size change buttons
         self.grb_na = tk.Button(self.grid_frame, text='+')
         self.grb_ea = tk.Button(self.grid_frame, text='+')
@@ -75,7 +85,7 @@ class Grid(tk.Frame):
         self.default_color_bg = self.grb_na.cget('background')
         self.default_color_abg = self.grb_na.cget('activebackground')
 
-        # create and grid the button display and size change buttons
+        # size and grid the cell display and size change buttons
         self.display_world()
 
         # set the size change button commands
@@ -107,9 +117,13 @@ class Grid(tk.Frame):
         self.checkpoint_button.pack(side='left')
         self.reset_button = tk.Button(self.controls, text='Reset', command=self.reset)
         self.reset_button.pack(side='left')
-        self.cache = None #  this will contain a copy of the world when the checkpoint button was last pressed
+        self.cache = None #  this will contain a snapshot of the world when the checkpoint button was last pressed
         self.clear_button = tk.Button(self.controls, text='Clear', command=self.clear)
         self.clear_button.pack(side='left')
+        self.undo_button = tk.Button(self.controls, text='Undo', command=self.undo)
+        self.undo_button.pack(side='left')
+        self.redo_button = tk.Button(self.controls, text='Redo', command=self.redo)
+        self.redo_button.pack(side='left')
 
         self.file_button = tk.Button(self.controls, text='Load/Save', command=self.open_file_window)
         self.file_button.pack(side='right')
@@ -137,6 +151,14 @@ class Grid(tk.Frame):
         self.steps.pack(side='right')
         self.stepcount.trace('w', self.stepchange)
         self.stepcache = 0
+        self.stats = profiling.RingBuffer(size=100)  # the most recent steps, recorded while the rate is shown
+        self.profiler = profiling.Profiler(self.stats)
+        self.show_rate = tk.IntVar()
+        self.rate_check = tk.Checkbutton(self.labels, text='Show rate', variable=self.show_rate,
+                                         onvalue=1, offvalue=0, command=self.toggle_rate)
+        self.rate_check.pack(side='right')
+        self.rate = tk.Label(self.labels, text='')
+        self.rate.pack(side='right')
 
         # fill the copy paste button frame
         self.copy_button = tk.Button(self.copy_paste_frame, text='Copy', command=self.begin_copy)
@@ -181,7 +203,7 @@ class Grid(tk.Frame):
         self.d_S.config(command=self.move_S)
 
     def coord_map(self, coord, backwards=False):
-        '''Maps from a coordinate on the button array to a coordinate on the world.'''
+        '''Maps from a coordinate on the display to a coordinate on the world.'''
         if self.zoomed:
             nw = self.zoomed_NW
         else:
@@ -193,51 +215,30 @@ class Grid(tk.Frame):
         return new_coord
 
     def display_world(self):
-        '''Initialises buttons based on world data.'''
-        self.button_array = []
-        for y in range(self.size[1]):
-            row = []
-            for x in range(self.size[0]):
-                w_coord = self.coord_map((x, y))
-                color = self.getcolor(w_coord)
-                button = tk.Button(self.grid_frame, relief="raised", bg=color,
-                                   activebackground=color)
-                row.append(button)
-            self.button_array.append(row)
-        self.set_button_commands()
-        self.grid_buttons()
+        '''Sizes the cell display to fit the world data and draws it.'''
+        self.cells.resize(self.size)
         self.grid_arrows()
         self.world_bounds = self.world.getbounds()
         self.indicate_oob()
+        self.redraw()
 
-    def grid_buttons(self):
-        '''Places the buttons representing the cellular automata.'''
-        for y in range(self.size[1]):
-            for x in range(self.size[0]):
-                self.button_array[y][x].grid(row=y+2, column=x+2)
+    def display(self):
+        '''Returns the canvas currently showing the world.'''
+        if self.zoomed:
+            return self.zc
+        return self.cells
 
     def grid_arrows(self):
-        '''Positions the "grid arrow" buttons appropriately for the size of the grid.'''
-        self.grb_na.config(width=self.size[0]*4 - 4)
-        self.grb_nd.config(width=self.size[0]*4 - 4)
-        self.grb_sd.config(width=self.size[0]*4 - 4)
-        self.grb_sa.config(width=self.size[0]*4 - 4)
-        self.grb_wa.config(height=self.size[1]*2 - 1)
-        self.grb_wd.config(height=self.size[1]*2 - 1)
-        self.grb_ed.config(height=self.size[1]*2 - 1)
-        self.grb_ea.config(height=self.size[1]*2 - 1)
-
-        self.grb_na.grid(row=0, column=2, columnspan=self.size[0])
-        self.grb_nd.grid(row=1, column=2, columnspan=self.size[0])
-        self.grb_sd.grid(row=self.size[1]+2, column=2, columnspan=self.size[0])
-        self.grb_sa.grid(row=self.size[1]+3, column=2, columnspan=self.size[0])
-        self.grb_wa.grid(row=2, column=0, rowspan=self.size[1])
-        self.grb_wd.grid(row=2, column=1, rowspan=self.size[1])
-        self.grb_ed.grid(row=2, column=self.size[0]+2, rowspan=self.size[1])
-        self.grb_ea.grid(row=2, column=self.size[0]+3, rowspan=self.size[1])
-
-        if self.zoomed:
-            self.zc.grid(row=2, column=2, rowspan=self.size[1], columnspan=self.size[0])
+        '''Positions the "grid arrow" buttons around the display, stretched to its size.'''
+        self.grb_na.grid(row=0, column=2, sticky='ew')
+        self.grb_nd.grid(row=1, column=2, sticky='ew')
+        self.grb_sd.grid(row=3, column=2, sticky='ew')
+        self.grb_sa.grid(row=4, column=2, sticky='ew')
+        self.grb_wa.grid(row=2, column=0, sticky='ns')
+        self.grb_wd.grid(row=2, column=1, sticky='ns')
+        self.grb_ed.grid(row=2, column=3, sticky='ns')
+        self.grb_ea.grid(row=2, column=4, sticky='ns')
+        self.display().grid(row=2, column=2)
 
     def indicate_oob(self):
         '''Changes the color of the grid arrow buttons to indicate the presence of live cells out of bounds.'''
@@ -283,79 +284,87 @@ class Grid(tk.Frame):
             height = self.world_bounds[1][1] - self.world_bounds[1][0]
         self.spansize.config(text='Horizontal span: {} Vertical span: {}'.format(width, height))
 
-    def getcolor(self, coord):
-        '''Returns the color associated with the specified state.'''
-        state = self.world.getcoordstate(coord)
-        color = self.palette[state]
-        return color
-
-    def command_generator(self, coord):
-        '''Generates a command to update the button in the specified position.'''
-        x, y = coord
-        button = self.button_array[y][x]
-
-        def command():
-            w_coord = self.coord_map(coord)
-            if self.copy_stage == 1:
-                self.first_copy(w_coord)
-            elif self.copy_stage == 2 or self.copy_stage == 3:
-                self.second_copy(w_coord)
-            elif self.paste_stage == 1 or self.paste_stage == 2:
-                self.first_paste(w_coord)
-            elif self.erase_stage == 1:
-                self.first_erase(w_coord)
-            elif self.erase_stage == 2 or self.erase_stage == 3:
-                self.second_erase(w_coord)
-            else:
-                self.world.editpoint(w_coord)
-                color = self.getcolor(w_coord)
-                button.config(bg=color, activebackground=color)
-                self.world_bounds = self.world.getbounds()
-                self.cellcountupdate()
-                self.stepcount.set(0)
-        return command
-
-    def set_button_commands(self):
-        '''Assigns the buttons in the grid with the appropriate commands'''
-        for y in range(self.size[1]):
-            for x in range(self.size[0]):
-                self.button_array[y][x].config(command=self.command_generator((x, y)))
+    def click(self, event):
+        '''Edits the cell under a click on the display, or selects it while copying, pasting or erasing.'''
+        coord = self.cells.cell_at(event.x, event.y)
+        if coord is None:
+            return
+        w_coord = self.coord_map(coord)
+        if self.copy_stage == 1:
+            self.first_copy(w_coord)
+        elif self.copy_stage == 2 or self.copy_stage == 3:
+            self.second_copy(w_coord)
+        elif self.paste_stage == 1 or self.paste_stage == 2:
+            self.first_paste(w_coord)
+        elif self.erase_stage == 1:
+            self.first_erase(w_coord)
+        elif self.erase_stage == 2 or self.erase_stage == 3:
+            self.second_erase(w_coord)
+        else:
+            self.world.editpoint(w_coord)
+            self.draw_region(coord, coord)
+            self.world_bounds = self.world.getbounds()
+            self.cellcountupdate()
+            self.stepcount.set(0)
 
     def refresh(self, full=True):
-        '''Sets all the appropriate colors to the button grid.'''
+        '''Draws the world on the display, either all of it or only the parts which have changed.'''
         if full or self.world.CA.mode != 'stable':  # wireworld shouldn't add or remove live cells while self updating
             self.indicate_oob()
             self.cellcountupdate()
 
-        if self.zoomed:
-            size = self.zoomed_size
-        else:
-            size = self.size
-
-        # We loop through the minimal number of cells in order to refresh,
-        # either all the displayed cells or all the changed cells.
+        size = self.display().size
         if full or len(self.world.changeset) > size[0]*size[1]:
-            for y in range(size[1]):
-                for x in range(size[0]):
-                    w_coord = self.coord_map((x, y))
-                    if full or w_coord in self.world.changeset:
-                        color = self.getcolor(w_coord)
-                        self.update_color(color, (x, y))
+            self.redraw()
         else:
-            for coord in self.world.changeset:
-                w_coord = coord
-                x, y = self.coord_map(coord, backwards=True)
-                if x >= 0 and x < size[0] and y >= 0 and y < size[1]:
-                    color = self.getcolor(w_coord)
-                    self.update_color(color, (x, y))
-
-    def update_color(self, color, coord):
-        '''Updates the color of the cell at the chosen coordinate for the current display.'''
-        x, y = coord
-        if self.zoomed:
-            self.zc.changepix(coord, color)
+            self.draw_changes()
+
+    def redraw(self):
+        '''Draws every displayed cell, and the marks on any selected cells.'''
+        size = self.display().size
+        self.draw_region((0, 0), (size[0] - 1, size[1] - 1))
+        self.draw_marks()
+
+    def draw_region(self, first_coord, second_coord):
+        '''Draws the cells of the world between two coordinates of the display, as a single block.'''
+        states = self.world.get_region(self.coord_map(first_coord), self.coord_map(second_coord), mask=False)
+        self.display().draw(states, *first_coord)
+
+    def draw_changes(self):
+        '''
+        Draws the cells in the changeset.
+
+        The display is divided into square tiles, and every tile holding a changed cell is redrawn as one block, so
+        a step costs a call to Tk for each tile which changed rather than for each cell.
+        '''
+        width, height = self.display().size
+        nw_x, nw_y = self.coord_map((0, 0))
+        tiles = set()
+        for x, y in self.world.changeset:
+            x -= nw_x
+            y -= nw_y
+            if 0 <= x < width and 0 <= y < height:
+                tiles.add((x // tile_size, y // tile_size))
+        for tx, ty in tiles:
+            x0 = tx * tile_size
+            y0 = ty * tile_size
+            self.draw_region((x0, y0), (min(x0 + tile_size, width) - 1, min(y0 + tile_size, height) - 1))
+
+    def mark(self, w_coord, bitmap):
+        '''Marks a selected cell with a bitmap, or removes its mark if the bitmap is empty.'''
+        if bitmap:
+            self.marks[w_coord] = bitmap
         else:
-            self.button_array[y][x].config(bg=color, activebackground=color)
+            self.marks.pop(w_coord, None)
+        if not self.zoomed:
+            self.cells.mark(self.coord_map(w_coord, backwards=True), bitmap)
+
+    def draw_marks(self):
+        '''Draws the marks of the selected cells in their current positions on the display.'''
+        self.cells.clear_marks()
+        if not self.zoomed:
+            for w_coord, bitmap in self.marks.items():
+                self.cells.mark(self.coord_map(w_coord, backwards=True), bitmap)
 
     def stepchange(self, *args):
         '''This is called and updates the steps label whenever self.stepcount changes.'''
@@ -363,10 +372,31 @@ class Grid(tk.Frame):
 
     def w_update(self):
         '''Updates the cellular automata.'''
+        # the world may have been replaced since the last step, so the profiler is attached each time
+        self.world.profiler = self.profiler if self.show_rate.get() else None
         self.world.step()
         self.world_bounds = self.world.getbounds()
         self.refresh(full=False)
         self.stepcount.set(self.stepcount.get() + 1)
+        if self.show_rate.get():
+            self.rateupdate()
+
+    def toggle_rate(self):
+        '''Starts or stops recording the steps, clearing the readout when it is hidden.'''
+        if not self.show_rate.get():
+            self.world.profiler = None
+            self.stats.records.clear()
+            self.rate.config(text='')
+
+    def rateupdate(self):
+        '''Displays the steps per second and cells per step from the recent steps.'''
+        steps_per_second = self.stats.steps_per_second()
+        cells_per_step = self.stats.mean('cells_examined')
+        if cells_per_step is None:
+            cells_per_step = self.stats.mean('changes')
+        if steps_per_second is None or cells_per_step is None:
+            return
+        self.rate.config(text='steps/s: {:.0f} cells/step: {:.0f}'.format(steps_per_second, cells_per_step))
 
     def click_run(self):
         '''Starts the run loop.'''
@@ -397,16 +427,16 @@ class Grid(tk.Frame):
         self.running = False
 
     def checkpoint(self):
-        '''Creates a copy of current world data.'''
-        self.cache = copy.deepcopy(self.world)
+        '''Takes a snapshot of the current world data.'''
+        self.cache = self.world.snapshot()
         self.stepcache = self.stepcount.get()
 
     def reset(self):
-        '''Loads world data from the cache and pauses.'''
+        '''Restores the world from the snapshot in the cache and pauses.'''
         if self.cache is None:
             return
         self.pause()
-        self.world = copy.deepcopy(self.cache)
+        self.world.restore(self.cache)
         self.world_bounds = self.world.getbounds()
         self.refresh()
         self.stepcount.set(self.stepcache)
@@ -414,11 +444,29 @@ class Grid(tk.Frame):
     def clear(self):
         '''Removes world grid data and pauses.'''
         self.pause()
-        self.world.clear
+        self.world.clear()
         self.world_bounds = None
         self.refresh()
         self.stepcount.set(0)
 
+    def undo(self):
+        '''Undoes the last edit, paste or erase and pauses.'''
+        self.pause()
+        if self.world.undo():
+            self.world_bounds = self.world.getbounds()
+            self.refresh(full=False)
+            self.indicate_oob()
+            self.cellcountupdate()
+
+    def redo(self):
+        '''Redoes the last undone edit and pauses.'''
+        self.pause()
+        if self.world.redo():
+            self.world_bounds = self.world.getbounds()
+            self.refresh(full=False)
+            self.indicate_oob()
+            self.cellcountupdate()
+
     def open_file_window(self):
         '''Opens a window with load and save options.'''
         self.pause()
@@ -436,22 +484,14 @@ class Grid(tk.Frame):
         self.save_button = tk.Button(self.window, text='Save', command=self.save)
         self.save_button.grid(row=1, column=1, sticky='W')
 
-    def destroy_buttons(self):
-        '''Destroys all the buttons in the button array.'''
-        for y in self.button_array:
-            for x in y:
-                x.destroy()
-        self.button_array = []
-
-
     def load(self):
         '''Attempts to load and display world data from file.'''
         try:
             world = ww.load_world(self.file_name.get())
         except Exception as e:
             messagebox.showerror("Error", str(e))
-        self.destroy_buttons()
         self.world = world
+        self.cache = None  # a snapshot of the previous world cannot be restored to this one
         self.size = self.world.size
         self.display_world()
         self.window.destroy()
@@ -506,122 +546,14 @@ class Grid(tk.Frame):
                     if self.zoomed:
                         self.zoomed_NW = (self.zoomed_NW[0] - delta*span, self.zoomed_NW[1])
             if self.zoomed:
-                # expand the canvas
-                self.zc.config(width=self.zoomed_size[0]*2, height=self.zoomed_size[1]*2)
-                size = self.zoomed_size
-            else:
-                size = self.size
-
-            # add or remove rows or columns
-            if operation == '+':
-                if orientation == 'N' or orientation == 'S':
-                    if self.zoomed and orientation == 'N':
-                        self.zc.move('all', 0, span*self.zc.pix_size)
-                    rows = []
-                    for dy in range(span):
-                        row = []
-                        if orientation == 'N':
-                            y = dy
-                        else:
-                            y = dy + size[1] - span
-                        for x in range(size[0]):
-                            w_coord = self.coord_map((x, y))
-                            color = self.getcolor(w_coord)
-                            if self.zoomed:
-                                display_object = self.zc.create_rectangle(x*self.zc.pix_size, y*self.zc.pix_size,
-                                                                          x*self.zc.pix_size+1, y*self.zc.pix_size+1,
-                                                                          outline=color)
-                            else:
-                                display_object = tk.Button(self.grid_frame, relief="raised", bg=color,
-                                                           activebackground=color)
-                            row.append(display_object)
-                        rows.append(row)
-                    if self.zoomed:
-                        display_array = self.zc.pixel_array
-                    else:
-                        display_array = self.button_array
-                    if orientation == 'N':
-                        for row in reversed(rows):
-                            display_array.insert(0, row)
-                    elif orientation == 'S':
-                        for row in rows:
-                            display_array.append(row)
-                if orientation == 'E' or orientation == 'W':
-                    if self.zoomed and orientation == 'W':
-                        self.zc.move('all', span*self.zc.pix_size, 0)
-                    rows = []
-                    for y in range(size[1]):
-                        row = []
-                        for dx in range(span):
-                            if orientation == 'E':
-                                x = dx + size[0] - span
-                            elif orientation == 'W':
-                                x = dx
-                            w_coord = self.coord_map((x,y))
-                            color = self.getcolor(w_coord)
-                            if self.zoomed:
-                                display_object = self.zc.create_rectangle(x*self.zc.pix_size, y*self.zc.pix_size,
-                                                                          x*self.zc.pix_size+1, y*self.zc.pix_size+1,
-                                                                          outline=color)
-                            else:
-                                display_object = tk.Button(self.grid_frame, relief="raised", bg=color,
-                                                           activebackground=color)
-                            row.append(display_object)
-                        rows.append(row)
-                    if self.zoomed:
-                        display_array = self.zc.pixel_array
-                    else:
-                        display_array = self.button_array
-                    if orientation == 'E':
-                        for display_row, extra_row in zip(display_array, rows):
-                            display_row.extend(extra_row)
-                    elif orientation == 'W':
-                        for display_row, extra_row in zip(display_array, rows):
-                            for x in reversed(extra_row):
-                                display_row.insert(0, x)
-            if operation == '-':
-                if self.zoomed:
-                    display_object = self.zc.pixel_array
-                else:
-                    display_object = self.button_array
-                if orientation == 'N' or orientation == 'S':
-                    if orientation == 'N':
-                        pop_side = 0
-                    else:
-                        pop_side = -1
-                    for y in range(span):
-                        row = display_object.pop(pop_side)
-                        for cell in row:
-                            if self.zoomed:
-                                self.zc.delete(cell)
-                            else:
-                                cell.destroy()
-                if orientation == 'E' or orientation == 'W':
-                    if orientation == 'W':
-                        pop_side = 0
-                    else:
-                        pop_side = -1
-                    for row in display_object:
-                        for x in range(span):
-                            cell = row.pop(pop_side)
-                            if self.zoomed:
-                                self.zc.delete(cell)
-                            else:
-                                cell.destroy()
-                if self.zoomed and orientation == 'N':
-                    self.zc.move('all', 0, -span*self.zc.pix_size)
-                if self.zoomed and orientation == 'W':
-                    self.zc.move('all', -span*self.zc.pix_size, 0)
-
-            if self.zoomed:
+                self.zc.resize(self.zoomed_size)
                 self.zc.box_grid(self)
             else:
-                self.set_button_commands()
-                self.grid_buttons()
-            self.grid_arrows()
+                self.cells.resize(self.size)
             self.indicate_oob()
-            if self.paste_stage == 2 and operation == '+':
-                self.preview_paste(self.first_coord)
+            self.redraw()
+            if self.paste_stage == 2:
+                self.preview_paste(self.coord_map(self.first_coord, backwards=True))
         return mover
 
     def move_factory(self, orientation):
@@ -632,40 +564,25 @@ class Grid(tk.Frame):
                 movement = self.movement.get()
             except:
                 return
+            move_dict = {'N': (0, -1), 'E': (1, 0),
+                         'W': (-1, 0), 'S': (0, 1)}
+            move_vector = move_dict[orientation]
+            self.grid_NW = (self.grid_NW[0] + move_vector[0]*movement,
+                            self.grid_NW[1] + move_vector[1]*movement)
             if self.zoomed and zoom_locked == 1:
-                    move_dict = {'N': (0, -1), 'E': (1, 0),
-                                 'W': (-1, 0), 'S': (0, 1)}
-                    move_vector = move_dict[orientation]
-                    self.grid_NW = (self.grid_NW[0] + move_vector[0]*movement,
-                                    self.grid_NW[1] + move_vector[1]*movement)
-                    self.zc.box_grid(self)
-            else:
-                adder, remover = self.get_arrows(orientation)
-                if type(movement) is not int:
-                    return
-                for x in range(movement):
-                    adder()
-                    remover()
+                self.zc.box_grid(self)
+                return
+            # the whole movement is made at once, so the display is only redrawn once
+            if self.zoomed:
+                self.zoomed_NW = (self.zoomed_NW[0] + move_vector[0]*movement*14,
+                                  self.zoomed_NW[1] + move_vector[1]*movement*14)
+                self.zc.box_grid(self)
+            self.indicate_oob()
+            self.redraw()
+            if self.paste_stage == 2:
+                self.preview_paste(self.coord_map(self.first_coord, backwards=True))
         return move
 
-    def get_arrows(self, orientation):
-        '''Returns a pair of functions which describe how to move in a given direction.'''
-        if orientation == 'N':
-            adder = self.add_n
-            remover = self.del_s
-        elif orientation == 'E':
-            adder = self.add_e
-            remover = self.del_w
-        elif orientation == 'W':
-            adder = self.add_w
-            remover = self.del_e
-        elif orientation == 'S':
-            adder = self.add_s
-            remover = self.del_n
-        else:
-            raise Exception('Bad orientation')
-        return adder, remover
-
     def palette_switch(self, palette):
         '''
         Changes the colors assigned to each state.
@@ -675,6 +592,9 @@ class Grid(tk.Frame):
             A dictionary from states to their colors.
         '''
         self.palette = palette
+        self.cells.set_palette(palette)
+        if self.zoomed:
+            self.zc.set_palette(palette)
         self.refresh()
 
     def n_mode(self):
@@ -693,50 +613,31 @@ class Grid(tk.Frame):
         self.refresh()
 
     def zoom_out(self):
-        '''Replaces the button array with a zoomed out canvas.'''
+        '''Replaces the cell display with a zoomed out canvas.'''
         self.stop_copy_paste()
         self.zoomed_NW = (self.grid_NW[0] - self.size[0] * 7, self.grid_NW[1] - self.size[1] * 7)
-        self.zc = ZoomedCanvas(master=self.grid_frame, grid=self)
+        self.zc = ZoomedCanvas(master=self.grid_frame, grid=self, palette=self.palette)
         self.zoom_button.config(text='Zoom in', command=self.zoom_in)
-        self.zc.grid(row=2, column=2, rowspan=self.size[1], columnspan=self.size[0])
-        self.destroy_buttons()
-        self.zoomed_size = (self.zc.width, self.zc.height)
+        self.cells.grid_remove()
+        self.zoomed_size = self.zc.size
         self.zoomed = True
+        self.grid_arrows()
         self.refresh()
 
     def zoom_in(self):
-        '''Replaces the canvas with a zoomed in button array.'''
+        '''Replaces the zoomed out canvas with the cell display.'''
         self.zc.destroy()
         self.zoom_button.config(text='Zoom out', command=self.zoom_out)
         self.zoomed = False
         self.display_world()
-        self.refresh()
-
-    def is_in_grid(self, coord):
-        '''Checks if a coordinate is within the bounds of the button_array.'''
-        if coord is None:
-            return False
-        if coord[0] < 0 or coord[1] < 0 or coord[0] >= self.size[0] or coord[1] >= self.size[1]:
-            return False
-        else:
-            return True
+        self.cellcountupdate()
 
     def reset_stage(self):
         '''Resets copy/paste state to default.'''
         if self.paste_stage == 2:
             self.refresh()
-        first_w = self.first_coord
-        second_w = self.second_coord
-        if first_w is not None:
-            last_coord = self.coord_map(first_w, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                self.button_array[ly][lx].config(bitmap='')
-        if second_w is not None:
-            last_coord = self.coord_map(second_w, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                self.button_array[ly][lx].config(bitmap='')
+        self.marks.clear()
+        self.cells.clear_marks()
         self.copy_stage = None
         self.paste_stage = None
         self.erase_stage = None
@@ -804,33 +705,22 @@ class Grid(tk.Frame):
 
     def first_copy(self, w_coord):  # TODO make the button size uniform somehow, or maybe it's a feature
         '''Sets the first coordinate after the copy process has started.'''
-        last_w_coord = self.first_coord
-        if last_w_coord is not None:
-            last_coord = self.coord_map(last_w_coord, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                self.button_array[ly][lx].config(bitmap='')
+        if self.first_coord is not None:
+            self.mark(self.first_coord, '')
         self.first_coord = w_coord
-        coord = self.coord_map(w_coord, backwards=True)
-        x, y = coord
-        self.button_array[y][x].config(bitmap='gray75', fg='green')
+        self.mark(w_coord, 'gray75')
         self.copy_stage = 2
 
     def second_copy(self, w_coord):
         '''Sets the second coordinate after the copy process has started.'''
         last_w_coord = self.second_coord
         if last_w_coord is not None:
-            last_coord = self.coord_map(last_w_coord, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                if last_w_coord == self.first_coord:
-                    self.button_array[ly][lx].config(bitmap='gray75')
-                else:
-                    self.button_array[ly][lx].config(bitmap='')
+            if last_w_coord == self.first_coord:
+                self.mark(last_w_coord, 'gray75')
+            else:
+                self.mark(last_w_coord, '')
         self.second_coord = w_coord
-        coord = self.coord_map(w_coord, backwards=True)
-        x, y = coord
-        self.button_array[y][x].config(bitmap='gray25', fg='green')
+        self.mark(w_coord, 'gray25')
         self.copy_stage = 3
 
     def first_paste(self, w_coord):
@@ -841,101 +731,150 @@ class Grid(tk.Frame):
         '''
         if self.paste_stage == 2:
             self.refresh()
-        last_w_coord = self.first_coord
-        if last_w_coord is not None:
-            last_coord = self.coord_map(last_w_coord, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                self.button_array[ly][lx].config(bitmap='')
+        if self.first_coord is not None:
+            self.mark(self.first_coord, '')
         self.first_coord = w_coord
-        coord = self.coord_map(w_coord, backwards=True)
-        x, y = coord
-        self.button_array[y][x].config(bitmap='gray75', fg='green')
+        self.mark(w_coord, 'gray75')
         self.paste_stage = 2
-        self.preview_paste(coord)
+        self.preview_paste(self.coord_map(w_coord, backwards=True))
 
     def preview_paste(self, origin_coord):
         '''Shows a preview of the result of confirming the paste action.'''
         if self.world.copy_section is not None:
             top_left = (origin_coord[0] + self.world.copy_section.offset[0],
                         origin_coord[1] + self.world.copy_section.offset[1])
-            for dy, row in enumerate(self.world.copy_section.state_array):
-                for dx, state in enumerate(row):
-                    coord = (top_left[0] + dx, top_left[1] + dy)
-                    if self.is_in_grid(coord):
-                        if state is None:
-                            display_state = 0
-                        else:
-                            display_state = state
-                        color = self.palette[display_state]
-                        x, y = coord
-                        self.button_array[y][x].config(bg=color, activebackground=color)
+            self.cells.draw(self.world.copy_section.state_array, *top_left)
 
     def first_erase(self, w_coord):
         '''Sets the first coordinate after the erase process has started.'''
-        last_w_coord = self.first_coord
-        if last_w_coord is not None:
-            last_coord = self.coord_map(last_w_coord, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                self.button_array[ly][lx].config(bitmap='')
+        if self.first_coord is not None:
+            self.mark(self.first_coord, '')
         self.first_coord = w_coord
-        coord = self.coord_map(w_coord, backwards=True)
-        x, y = coord
-        self.button_array[y][x].config(bitmap='gray75', fg='green')
+        self.mark(w_coord, 'gray75')
         self.erase_stage = 2
 
     def second_erase(self, w_coord):
         '''Sets the second coordinate after the erase process has started.'''
         last_w_coord = self.second_coord
         if last_w_coord is not None:
-            last_coord = self.coord_map(last_w_coord, backwards=True)
-            if self.is_in_grid(last_coord):
-                lx, ly = last_coord
-                if last_w_coord == self.first_coord:
-                    self.button_array[ly][lx].config(bitmap='gray75')
-                else:
-                    self.button_array[ly][lx].config(bitmap='')
+            if last_w_coord == self.first_coord:
+                self.mark(last_w_coord, 'gray75')
+            else:
+                self.mark(last_w_coord, '')
         self.second_coord = w_coord
-        coord = self.coord_map(w_coord, backwards=True)
-        x, y = coord
-        self.button_array[y][x].config(bitmap='gray25', fg='green')
+        self.mark(w_coord, 'gray25')
         self.erase_stage = 3
 
 
-class ZoomedCanvas(tk.Canvas):
-    '''A canvas containing a zoomed out view of the CA.'''
-    def __init__(self, master=None, width=None, height=None, grid=None):
-        if grid is None:
-            self.width = width
-            self.height = height
+class CellCanvas(tk.Canvas):
+    '''
+    A canvas showing a rectangle of cells as a single image, with each cell a square of cell_size pixels.
+
+    Cells are drawn from arrays of states, which a palette lookup turns into pixels all at once. The pixels of a
+    block of cells are uploaded to the image as one PPM, so drawing a block costs one call to Tk however many cells
+    it holds. Marks on selected cells are drawn as rectangles over the image.
+    '''
+    def __init__(self, master=None, size=(1, 1), cell_size=16, palette=colordict):
+        super().__init__(master, highlightthickness=0)
+        self.cell_size = cell_size
+        self.image = None
+        self.image_item = None
+        self.size = None
+        self.mark_items = dict()
+        self.set_palette(palette)
+        self.resize(size)
+
+    def rgb(self, color):
+        '''Returns the 8 bit red, green and blue values of a Tk color.'''
+        return [value // 256 for value in self.winfo_rgb(color)]
+
+    def set_palette(self, palette):
+        '''Sets the colors of the states from a dictionary, as an array of RGB values indexed by state.'''
+        self.palette = np.zeros((max(palette) + 1, 3), dtype=np.uint8)
+        for state, color in palette.items():
+            self.palette[state] = self.rgb(color)
+        self.line_rgb = np.array(self.rgb(grid_line_color), dtype=np.uint8)
+
+    def resize(self, size):
+        '''
+        Sets the number of cells across and down.
+
+        The image is kept, and only changes size if the number of cells does, in which case it should be redrawn.
+        '''
+        width = size[0] * self.cell_size
+        height = size[1] * self.cell_size
+        if self.image is None:
+            self.image = tk.PhotoImage(width=width, height=height)
+            self.image_item = self.create_image(0, 0, image=self.image, anchor='nw')
+        elif size != self.size:
+            self.image.config(width=width, height=height)
         else:
-            self.width = grid.size[0]*14
-            self.height = grid.size[1]*14
-        self.pix_size = 2  # set the size of the pixels/cells
-        super().__init__(master, width=self.width * self.pix_size, height=self.height * self.pix_size)
+            return
+        self.size = size
+        self.config(width=width, height=height)
+        self.clear_marks()
+
+    def draw(self, states, x, y):
+        '''Draws a 2D array of states, states[y][x], with its top left cell at (x, y), clipped to the canvas.'''
+        states = np.asarray(states)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1 = min(x + states.shape[1], self.size[0])
+        y1 = min(y + states.shape[0], self.size[1])
+        if x0 >= x1 or y0 >= y1:
+            return
+        states = states[y0 - y:y1 - y, x0 - x:x1 - x]
+        pixels = np.take(self.palette, states, axis=0, mode='clip')
+        size = self.cell_size
+        if size > 1:
+            pixels = pixels.repeat(size, axis=0).repeat(size, axis=1)
+            if size >= 4:
+                pixels[size - 1::size] = self.line_rgb
+                pixels[:, size - 1::size] = self.line_rgb
+        height, width = pixels.shape[:2]
+        data = 'P6 {} {} 255\n'.format(width, height).encode() + pixels.tobytes()
+        self.image.put(data, to=(x0 * size, y0 * size))
+
+    def cell_at(self, x, y):
+        '''Returns the cell under a pixel of the canvas, or None if it is outside the cells.'''
+        coord = (x // self.cell_size, y // self.cell_size)
+        if 0 <= coord[0] < self.size[0] and 0 <= coord[1] < self.size[1]:
+            return coord
+        return None
+
+    def mark(self, coord, bitmap):
+        '''Covers a cell with a stippled bitmap, or uncovers it if the bitmap is empty.'''
+        item = self.mark_items.pop(coord, None)
+        if item is not None:
+            self.delete(item)
+        x, y = coord
+        if bitmap and 0 <= x < self.size[0] and 0 <= y < self.size[1]:
+            size = self.cell_size
+            self.mark_items[coord] = self.create_rectangle(x*size, y*size, (x + 1)*size - 1, (y + 1)*size - 1,
+                                                           fill='green', outline='green', stipple=bitmap)
+
+    def clear_marks(self):
+        '''Removes every mark.'''
+        for item in self.mark_items.values():
+            self.delete(item)
+        self.mark_items = dict()
+
 
-        self.setpixels()
+class ZoomedCanvas(CellCanvas):
+    '''A canvas containing a zoomed out view of the CA.'''
+    def __init__(self, master=None, width=None, height=None, grid=None, palette=colordict):
+        if grid is not None:
+            width = grid.size[0]*14
+            height = grid.size[1]*14
         self.o_box = None
+        super().__init__(master, size=(width, height), cell_size=2, palette=palette)  # set the size of the cells
         self.box_grid(grid)
 
-    def setpixels(self):
-        '''fill the canvas with pixels to be edited later.'''
-        self.pixel_array = []
-        for y in range(self.height):
-            row = []
-            for x in range(self.width):
-                rec = self.create_rectangle(x*self.pix_size, y*self.pix_size,
-                                            x*self.pix_size + 1, y*self.pix_size + 1)
-                row.append(rec)
-            self.pixel_array.append(row)
-
     def setoriginbox(self, big_NW, small_NW, small_size):
         '''Creates a box at the given coordinates.'''
-        x0 = (small_NW[0]-big_NW[0])*self.pix_size - 1
-        y0 = (small_NW[1]-big_NW[1])*self.pix_size - 1
-        x1 = x0 + (small_size[0]*self.pix_size) + 1
-        y1 = y0 + (small_size[1]*self.pix_size) + 1
+        x0 = (small_NW[0]-big_NW[0])*self.cell_size - 1
+        y0 = (small_NW[1]-big_NW[1])*self.cell_size - 1
+        x1 = x0 + (small_size[0]*self.cell_size) + 1
+        y1 = y0 + (small_size[1]*self.cell_size) + 1
         if self.o_box is None:
             self.o_box = self.create_rectangle(x0, y0, x1, y1,
                                                fill='', outline='gray', outlinestipple='gray50', tags='o_box')
@@ -948,13 +887,6 @@ class ZoomedCanvas(tk.Canvas):
         self.setoriginbox(grid.zoomed_NW, grid.grid_NW, grid.size)
 
 
-    def changepix(self, coord, color):
-        '''Sets the color of a pixel at a given coordinate.'''
-        x, y = coord
-        pix_ID = self.pixel_array[y][x]
-        self.itemconfig(pix_ID, outline=color)
-
-
 def example_run():
     '''Launches the GUI with an example file.'''
     world_file = 'example_06.json'